@@ -1,57 +1,378 @@
 from flask import Flask, request
-from queue import Queue
 from services.webhook import send_webhook
+from services.job_registry import job_registry, JOB_RETENTION_SECONDS
+from services.persistent_queue import PersistentQueue
+from services.job_control import job_context, cancel_job as cancel_running_job, get_cancel_reason, get_deadline_at, start_watchdog
+from services.job_dedup import JobDeduplicator, get_dedup_key, JOB_DEDUP
+from services.job_priority import PriorityTaskQueue, get_job_priority, get_queue_key, get_effective_priority
+from services.scratch_space import job_scratch, ScratchSpaceUnavailable, start_janitor
+from services.payload_logging import log_payload
+from app_utils import TASK_FUNCTIONS, get_task_key
+from contextlib import nullcontext
 import threading
+import logging
 import uuid
 import os
 import time
 from version import BUILD_NUMBER  # Import the BUILD_NUMBER
 
+logger = logging.getLogger(__name__)
+
 MAX_QUEUE_LENGTH = int(os.environ.get('MAX_QUEUE_LENGTH', 0))
+QUEUE_WORKERS = os.environ.get('QUEUE_WORKERS')
+# Directory for the on-disk job journal; unset keeps the queue in memory only
+QUEUE_PERSIST_DIR = os.environ.get('QUEUE_PERSIST_DIR')
+# What to do with a job that was running when its worker died: 'rerun' or 'fail'
+QUEUE_RECOVERY_MODE = os.environ.get('QUEUE_RECOVERY_MODE', 'rerun')
+QUEUE_MAX_ATTEMPTS = int(os.environ.get('QUEUE_MAX_ATTEMPTS', 2))
+# Share one on-disk queue between all gunicorn workers on the host so any idle worker takes the next job
+QUEUE_SHARED = os.environ.get('QUEUE_SHARED', 'false').lower() in ('1', 'true')
+QUEUE_POLL_INTERVAL = float(os.environ.get('QUEUE_POLL_INTERVAL', 0.5))
+if QUEUE_SHARED and not QUEUE_PERSIST_DIR:
+    QUEUE_PERSIST_DIR = '/tmp/nca_queue'
+
+# Resource classes declared by routes, with their default worker count and queue depth (0 = unlimited)
+RESOURCE_CLASSES = {
+    'cpu-encode': {'workers': 1, 'max_queue_length': 0},   # ffmpeg re-encodes and muxing
+    'whisper': {'workers': 1, 'max_queue_length': 0},      # speech-to-text inference
+    'io-transfer': {'workers': 4, 'max_queue_length': 0},  # streaming uploads/downloads
+    'light': {'workers': 2, 'max_queue_length': 0}         # short conversions and scripts
+}
+DEFAULT_RESOURCE_CLASS = 'cpu-encode'
+
+def get_resource_class_setting(resource_class, name):
+    """Read a per-class setting, e.g. QUEUE_WORKERS_IO_TRANSFER or MAX_QUEUE_LENGTH_WHISPER."""
+    env_name = f"{name.upper()}_{resource_class.upper().replace('-', '_')}"
+    if os.environ.get(env_name):
+        return int(os.environ[env_name])
+    if name == 'queue_workers' and QUEUE_WORKERS:
+        return int(QUEUE_WORKERS)
+    return RESOURCE_CLASSES[resource_class]['workers' if name == 'queue_workers' else name]
 
 def create_app():
     app = Flask(__name__)
 
-    # Create a queue to hold tasks
-    task_queue = Queue()
-    queue_id = id(task_queue)  # Generate a single queue_id for this worker
+    # One queue per resource class, each drained by its own pool of worker threads
+    task_queues = {}
+    queue_limits = {}
+    active_jobs = {}
+    active_jobs_lock = threading.Lock()
+    queue_id = id(task_queues)  # Generate a single queue_id for this worker
+    persistent_queue = PersistentQueue(QUEUE_PERSIST_DIR) if QUEUE_PERSIST_DIR else None
+    # Wakes this worker's consumers as soon as it enqueues a job; other workers' jobs are found by polling
+    queue_events = {}
+    # Payloads of jobs waiting in this worker's in-memory queues, and queued jobs cancelled before they started
+    pending_jobs = {}
+    cancelled_jobs = set()
+    pending_lock = threading.Lock()
+    # Identical requests share one job; duplicates subscribe to its result
+    job_deduplicator = JobDeduplicator()
+
+    def get_queue_length(resource_class=None):
+        if QUEUE_SHARED:
+            return persistent_queue.count_queued(resource_class)
+        if resource_class:
+            return task_queues[resource_class].qsize()
+        return sum(q.qsize() for q in task_queues.values())
+
+    def get_queue_stats():
+        return {
+            resource_class: {
+                "workers": queue_limits[resource_class]['workers'],
+                "active": active_jobs[resource_class],
+                "queue_length": get_queue_length(resource_class),
+                "max_queue_length": queue_limits[resource_class]['max_queue_length'] or "unlimited"
+            }
+            for resource_class in task_queues
+        }
+
+    def build_task_func(row):
+        """Rebuild the task of a persisted job, or a failing task if it must not be re-run."""
+        job_id, data, endpoint = row['job_id'], row['data'], row['endpoint']
+        f = TASK_FUNCTIONS.get(row['task'])
+        if f is None:
+            return lambda: (f"Unknown task {row['task']} after restart", endpoint, 500)
+        if row['attempts'] > 0 and (QUEUE_RECOVERY_MODE == 'fail' or row['attempts'] >= QUEUE_MAX_ATTEMPTS):
+            return lambda: ("Job interrupted by a worker restart", endpoint, 500)
+        return lambda: f(job_id=job_id, data=data)
 
-    # Function to process tasks from the queue
-    def process_queue():
+    def get_next_job(resource_class):
+        if not QUEUE_SHARED:
+            return task_queues[resource_class].get()
         while True:
-            job_id, data, task_func, queue_start_time = task_queue.get()
-            queue_time = time.time() - queue_start_time
-            run_start_time = time.time()
-            pid = os.getpid()  # Get the PID of the actual processing thread
-            response = task_func()
-            run_time = time.time() - run_start_time
-            total_time = time.time() - queue_start_time
-
-            response_data = {
-                "endpoint": response[1],
-                "code": response[2],
+            row = persistent_queue.claim(resource_class)
+            if row:
+                if job_registry.get(row['job_id']) is None:
+                    job_registry.set(row['job_id'], {"id": row['data'].get("id"), "endpoint": row['endpoint'],
+                                                     "resource_class": resource_class, "state": "queued",
+                                                     "stage": "queued", "queued_at": row['enqueued_at'], "priority": row['priority']})
+                return (row['job_id'], row['data'], build_task_func(row), row['enqueued_at'], row['endpoint'], row['priority'],
+                        row['deadline_at'])
+            queue_events[resource_class].wait(QUEUE_POLL_INTERVAL)
+            queue_events[resource_class].clear()
+
+    def get_job(job_id):
+        """Look up a job in this worker's registry, falling back to (or, when shared, preferring) the on-disk queue."""
+        job = job_registry.get(job_id)
+        stored_job = persistent_queue.get(job_id) if persistent_queue else None
+        if stored_job and (job is None or QUEUE_SHARED):
+            if job and job.get('state') == stored_job['state']:
+                stored_job['stage'] = job.get('stage')
+            job = {**(job or {}), **stored_job}
+        return job
+
+    def find_duplicate_job(dedup_key, job_id):
+        """Look up the job last seen for a request fingerprint, or one submitted to another worker."""
+        job = get_job(job_id) if job_id else None
+        if not job_deduplicator.is_reusable(job) and persistent_queue:
+            stored_job_id = persistent_queue.find_job_id(dedup_key)
+            job = get_job(stored_job_id) if stored_job_id else None
+        return job
+
+    def add_subscriber(job_id, subscriber):
+        if persistent_queue:
+            persistent_queue.add_subscriber(job_id, subscriber)
+        else:
+            job_deduplicator.add_subscriber(job_id, subscriber)
+
+    def notify_subscribers(job_id, response_data):
+        """Send a finished job's result to the webhooks of the duplicate requests that joined it."""
+        subscribers = persistent_queue.pop_subscribers(job_id) if persistent_queue else job_deduplicator.pop_subscribers(job_id)
+        for subscriber in subscribers:
+            send_webhook(subscriber['webhook_url'], {**response_data, "id": subscriber.get("id"), "deduplicated": True})
+
+    def serve_duplicate(job, data, run_async):
+        """
+        Answer a request with the job of an identical request. While that job is queued or
+        running the answer is 202 with its job_id, also for synchronous requests, which would
+        otherwise hold a request thread for a job that may be waiting in another worker.
+        """
+        job_id = job['job_id']
+        if run_async or job['state'] in ('queued', 'running'):
+            if run_async and data.get("webhook_url"):
+                add_subscriber(job_id, {"webhook_url": data["webhook_url"], "id": data.get("id")})
+                # The job may have finished while the subscriber was being attached
+                job = get_job(job_id) or job
+                if job['state'] not in ('queued', 'running') and isinstance(job.get('result'), dict):
+                    notify_subscribers(job_id, job['result'])
+            return {
+                "code": 202,
                 "id": data.get("id"),
                 "job_id": job_id,
-                "response": response[0] if response[2] == 200 else None,
-                "message": "success" if response[2] == 200 else response[0],
-                "pid": pid,
+                "message": "processing" if job['state'] in ('queued', 'running') else job['state'],
+                "deduplicated": True,
+                "pid": os.getpid(),
                 "queue_id": queue_id,
-                "run_time": round(run_time, 3),
-                "queue_time": round(queue_time, 3),
-                "total_time": round(total_time, 3),
-                "queue_length": task_queue.qsize(),
+                "resource_class": job.get('resource_class'),
+                "queue_length": get_queue_length(),
                 "build_number": BUILD_NUMBER  # Add build number to response
-            }
+            }, 202
+
+        result = job.get('result') if job else None
+        if not isinstance(result, dict):
+            return {
+                "code": 500,
+                "id": data.get("id"),
+                "job_id": job_id,
+                "message": result or "Result of the duplicate job is no longer available",
+                "deduplicated": True,
+                "pid": os.getpid(),
+                "queue_id": queue_id,
+                "build_number": BUILD_NUMBER  # Add build number to response
+            }, 500
+        return {**result, "id": data.get("id"), "deduplicated": True}, result['code']
+
+    def finish_job(job_id, data, resource_class, response, queue_start_time, run_start_time, state=None, priority=None):
+        """Record the outcome of a queued job and send its webhook."""
+        run_time = time.time() - run_start_time
+        total_time = time.time() - queue_start_time
+
+        response_data = {
+            "endpoint": response[1],
+            "code": response[2],
+            "id": data.get("id"),
+            "job_id": job_id,
+            "response": response[0] if response[2] == 200 else None,
+            "message": "success" if response[2] == 200 else response[0],
+            "pid": os.getpid(),  # Get the PID of the actual processing thread
+            "queue_id": queue_id,
+            "resource_class": resource_class,
+            "priority": priority,
+            "effective_priority": get_effective_priority(priority, queue_start_time, run_start_time) if priority is not None else None,
+            "run_time": round(run_time, 3),
+            "queue_time": round(run_start_time - queue_start_time, 3),
+            "total_time": round(total_time, 3),
+            "queue_length": get_queue_length(),
+            "build_number": BUILD_NUMBER  # Add build number to response
+        }
+
+        state = state or ('completed' if response[2] == 200 else 'failed')
+        log_payload(logger, logging.INFO if response[2] == 200 else logging.WARNING,
+                    f"Job {job_id}: {state} with code {response[2]} after {response_data['run_time']}s", response_data)
+        job_registry.update(job_id, state=state, stage='finished',
+                            finished_at=time.time(), run_time=response_data['run_time'], code=response[2], result=response_data)
+
+        if persistent_queue:
+            persistent_queue.finish(job_id, state, response_data)
+
+        if data.get("webhook_url"):
+            send_webhook(data.get("webhook_url"), response_data)
+        notify_subscribers(job_id, response_data)
+
+    def get_cancelled_response(cancel_reason, endpoint):
+        if cancel_reason == 'cancelled':
+            return ("Job cancelled", endpoint, 499), 'cancelled'
+        return (f"Job {cancel_reason}", endpoint, 408), 'failed'
+
+    def run_job(resource_class, job_id, data, task_func, queue_start_time, endpoint, priority, deadline_at):
+        """Run one job taken from a resource class queue and record its outcome."""
+        if persistent_queue and not QUEUE_SHARED and not persistent_queue.mark_running(job_id):
+            # Cancelled through another worker while it was waiting here
+            with pending_lock:
+                pending_jobs.pop(job_id, None)
+                cancelled_jobs.discard(job_id)
+            return
+
+        run_start_time = time.time()
+        if deadline_at and run_start_time > deadline_at:
+            with pending_lock:
+                pending_jobs.pop(job_id, None)
+                cancelled_jobs.discard(job_id)
+            finish_job(job_id, data, resource_class, ("Deadline exceeded before the job started", endpoint, 408),
+                       queue_start_time, run_start_time, priority=priority)
+            return
 
+        with job_context(job_id, deadline_at):
+            with pending_lock:
+                pending_jobs.pop(job_id, None)
+                if job_id in cancelled_jobs:
+                    # Its webhook was sent when it was cancelled
+                    cancelled_jobs.discard(job_id)
+                    return
+
+            job_registry.update(job_id, state='running', stage='running', started_at=run_start_time,
+                                queue_time=round(run_start_time - queue_start_time, 3))
+            log_payload(logger, logging.INFO, f"Job {job_id}: Running {endpoint} in the {resource_class} queue", data)
+            with active_jobs_lock:
+                active_jobs[resource_class] += 1
+            try:
+                if get_cancel_reason(job_id) is None:
+                    with job_scratch(job_id):
+                        response = task_func()
+            except ScratchSpaceUnavailable as e:
+                response = (str(e), endpoint, 507)
+            except Exception as e:
+                response = (str(e), endpoint, 500)
+            finally:
+                with active_jobs_lock:
+                    active_jobs[resource_class] -= 1
+            cancel_reason = get_cancel_reason(job_id)
+
+        state = None
+        if cancel_reason:
+            response, state = get_cancelled_response(cancel_reason, endpoint)
+        finish_job(job_id, data, resource_class, response, queue_start_time, run_start_time, state, priority)
+
+    def fail_job(job_id, data, error):
+        """
+        Record a job as failed after an error outside its task (e.g. in the on-disk queue or
+        while finishing it) and send its webhook, unless its outcome was already recorded.
+        """
+        with pending_lock:
+            pending_jobs.pop(job_id, None)
+            cancelled_jobs.discard(job_id)
+        record = job_registry.get(job_id)
+        stored_job = persistent_queue.get(job_id) if persistent_queue else None
+        if not any(job and job.get('state') in ('queued', 'running') for job in (record, stored_job)):
+            return
+        response_data = {
+            "code": 500,
+            "id": data.get("id"),
+            "job_id": job_id,
+            "response": None,
+            "message": f"Job failed in the worker: {error}",
+            "pid": os.getpid(),
+            "queue_id": queue_id,
+            "build_number": BUILD_NUMBER  # Add build number to response
+        }
+        job_registry.update(job_id, state='failed', stage='finished', finished_at=time.time(), code=500, result=response_data)
+        if stored_job:
+            persistent_queue.finish(job_id, 'failed', response_data)
+        if data.get("webhook_url"):
             send_webhook(data.get("webhook_url"), response_data)
+        notify_subscribers(job_id, response_data)
 
-            task_queue.task_done()
+    # Function to process tasks from a resource class queue
+    def process_queue(resource_class):
+        while True:
+            try:
+                job = get_next_job(resource_class)
+            except Exception:
+                logger.exception(f"Could not take the next job from the {resource_class} queue")
+                time.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            # An error here must not end the thread, or the resource class loses a consumer for good
+            try:
+                run_job(resource_class, *job)
+            except Exception as e:
+                logger.exception(f"Job {job[0]}: failed in the {resource_class} queue")
+                try:
+                    fail_job(job[0], job[1], e)
+                except Exception:
+                    logger.exception(f"Job {job[0]}: could not record the failure")
 
-    # Start the queue processing in a separate thread
-    threading.Thread(target=process_queue, daemon=True).start()
+    def cancel_job(job_id):
+        """Cancel a queued or running job. Returns the job as it was before cancelling, or None if unknown."""
+        job = get_job(job_id)
+        if job is None or job['state'] not in ('queued', 'running'):
+            return job
+        with pending_lock:
+            if cancel_running_job(job_id):
+                # Running here: its process trees are killed and process_queue reports the cancellation
+                return job
+            data = pending_jobs.pop(job_id, None)
+            if data is not None and not QUEUE_SHARED:
+                cancelled_jobs.add(job_id)
+        row = persistent_queue.request_cancel(job_id) if persistent_queue else None
+        if row and row['state'] == 'queued':
+            data = row['data']
+        if data is not None:
+            queued_at = job.get('queued_at') or time.time()
+            finish_job(job_id, data, job['resource_class'], ("Job cancelled", job.get('endpoint'), 499),
+                       queued_at, time.time(), state='cancelled', priority=job.get('priority'))
+        # Otherwise the job runs in another worker, which picks up the request from the on-disk queue
+        return job
+
+    # Start a queue and its worker threads for every resource class
+    for resource_class in RESOURCE_CLASSES:
+        task_queues[resource_class] = PriorityTaskQueue()
+        queue_events[resource_class] = threading.Event()
+        active_jobs[resource_class] = 0
+        queue_limits[resource_class] = {
+            'workers': max(1, get_resource_class_setting(resource_class, 'queue_workers')),
+            'max_queue_length': get_resource_class_setting(resource_class, 'max_queue_length')
+        }
+        for _ in range(queue_limits[resource_class]['workers']):
+            threading.Thread(target=process_queue, args=(resource_class,), daemon=True).start()
+
+    def recover_jobs(rows):
+        """Re-queue jobs persisted by a worker that died, or fail them if they cannot be re-run."""
+        if QUEUE_SHARED:
+            # Recovered rows are queued again on disk, where any worker can claim them
+            return
+        for row in rows:
+            job_id, data = row['job_id'], row['data']
+            job_registry.set(job_id, {"id": data.get("id"), "endpoint": row['endpoint'], "resource_class": row['resource_class'],
+                                      "state": "queued", "stage": "recovered", "queued_at": row['enqueued_at'],
+                                      "priority": row['priority'], "queue_key": get_queue_key(row['priority'], row['enqueued_at'])})
+            with pending_lock:
+                pending_jobs[job_id] = data
+            task_queues[row['resource_class']].put((job_id, data, build_task_func(row), row['enqueued_at'], row['endpoint'],
+                                                    row['priority'], row['deadline_at']),
+                                                   row['priority'], row['enqueued_at'])
 
     # Decorator to add tasks to the queue or bypass it
-    def queue_task(bypass_queue=False):
+    def queue_task(bypass_queue=False, resource_class=DEFAULT_RESOURCE_CLASS, dedup=False):
         def decorator(f):
             def wrapper(*args, **kwargs):
                 job_id = str(uuid.uuid4())
@@ -59,11 +380,56 @@ def create_app():
                 pid = os.getpid()  # Get PID for non-queued tasks
                 start_time = time.time()
 
-                if bypass_queue or 'webhook_url' not in data:
+                if resource_class not in RESOURCE_CLASSES:
+                    raise ValueError(f"Unknown resource class: {resource_class}")
 
-                    response = f(job_id=job_id, data=data, *args, **kwargs)
-                    run_time = time.time() - start_time
+                # Parsed once here, so a deadline that is not a real date is rejected before any job exists
+                try:
+                    deadline_at = get_deadline_at(data.get("deadline"), start_time)
+                except (TypeError, ValueError) as e:
                     return {
+                        "code": 400,
+                        "id": data.get("id"),
+                        "message": f"Invalid deadline: {e}",
+                        "pid": pid,
+                        "queue_id": queue_id,
+                        "build_number": BUILD_NUMBER  # Add build number to response
+                    }, 400
+
+                # Clients without a webhook can still queue a job and poll /v1/toolkit/job/<job_id>
+                run_async = 'webhook_url' in data or request.headers.get('X-Async', '').lower() in ('1', 'true')
+
+                # Identical requests (same payload, or same Idempotency-Key header) share one job on routes
+                # whose jobs are idempotent
+                dedup_key = None
+                if JOB_DEDUP and dedup and not bypass_queue:
+                    dedup_key = get_dedup_key(request.path, data, request.headers.get('Idempotency-Key'))
+                    duplicate = job_deduplicator.claim(dedup_key, job_id, find_duplicate_job)
+                    if duplicate:
+                        return serve_duplicate(duplicate, data, run_async)
+
+                if bypass_queue or not run_async:
+
+                    if not bypass_queue:
+                        job_registry.set(job_id, {"id": data.get("id"), "endpoint": request.path, "resource_class": resource_class,
+                                                  "state": "running", "stage": "running", "started_at": start_time})
+                    state = None
+                    with job_context(job_id, deadline_at):
+                        try:
+                            with job_scratch(job_id) if not bypass_queue else nullcontext():
+                                response = f(job_id=job_id, data=data, *args, **kwargs)
+                        except ScratchSpaceUnavailable as e:
+                            response = (str(e), request.path, 507)
+                        except Exception as e:
+                            if not bypass_queue:
+                                job_registry.update(job_id, state='failed', stage='finished', finished_at=time.time(), code=500, result=str(e))
+                                notify_subscribers(job_id, {"code": 500, "job_id": job_id, "message": str(e), "response": None})
+                            raise
+                        cancel_reason = get_cancel_reason(job_id)
+                    if cancel_reason:
+                        response, state = get_cancelled_response(cancel_reason, request.path)
+                    run_time = time.time() - start_time
+                    response_data = {
                         "code": response[2],
                         "id": data.get("id"),
                         "job_id": job_id,
@@ -74,11 +440,16 @@ def create_app():
                         "total_time": round(run_time, 3),
                         "pid": pid,
                         "queue_id": queue_id,
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": get_queue_length(),
                         "build_number": BUILD_NUMBER  # Add build number to response
-                    }, response[2]
+                    }
+                    if not bypass_queue:
+                        job_registry.update(job_id, state=state or ('completed' if response[2] == 200 else 'failed'), stage='finished',
+                                            finished_at=time.time(), run_time=round(run_time, 3), code=response[2], result=response_data)
+                        notify_subscribers(job_id, response_data)
+                    return response_data, response[2]
                 else:
-                    if MAX_QUEUE_LENGTH > 0 and task_queue.qsize() >= MAX_QUEUE_LENGTH:
+                    if MAX_QUEUE_LENGTH > 0 and get_queue_length() >= MAX_QUEUE_LENGTH:
                         return {
                             "code": 429,
                             "id": data.get("id"),
@@ -86,11 +457,41 @@ def create_app():
                             "message": f"MAX_QUEUE_LENGTH ({MAX_QUEUE_LENGTH}) reached",
                             "pid": pid,
                             "queue_id": queue_id,
-                            "queue_length": task_queue.qsize(),
+                            "queue_length": get_queue_length(),
                             "build_number": BUILD_NUMBER  # Add build number to response
                         }, 429
 
-                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
+                    class_max_queue_length = queue_limits[resource_class]['max_queue_length']
+                    if class_max_queue_length > 0 and get_queue_length(resource_class) >= class_max_queue_length:
+                        return {
+                            "code": 429,
+                            "id": data.get("id"),
+                            "job_id": job_id,
+                            "message": f"Queue for resource class '{resource_class}' is full ({class_max_queue_length})",
+                            "pid": pid,
+                            "queue_id": queue_id,
+                            "resource_class": resource_class,
+                            "queue_length": get_queue_length(),
+                            "build_number": BUILD_NUMBER  # Add build number to response
+                        }, 429
+
+                    priority = get_job_priority(data, request.headers.get('X-API-Key'))
+                    if not QUEUE_SHARED:
+                        # Shared jobs are tracked on disk; the worker that claims one records it in its own registry
+                        job_registry.set(job_id, {"id": data.get("id"), "endpoint": request.path, "resource_class": resource_class,
+                                                  "state": "queued", "stage": "queued", "queued_at": start_time,
+                                                  "priority": priority, "queue_key": get_queue_key(priority, start_time)})
+                    if persistent_queue:
+                        persistent_queue.put(job_id, resource_class, get_task_key(f), request.path, data, start_time, dedup_key,
+                                             priority, deadline_at)
+                    if QUEUE_SHARED:
+                        queue_events[resource_class].set()
+                    else:
+                        with pending_lock:
+                            pending_jobs[job_id] = data
+                        task_queues[resource_class].put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time, request.path,
+                                                         priority, deadline_at),
+                                                        priority, start_time)
 
                     return {
                         "code": 202,
@@ -99,14 +500,20 @@ def create_app():
                         "message": "processing",
                         "pid": pid,
                         "queue_id": queue_id,
+                        "resource_class": resource_class,
+                        "priority": priority,
                         "max_queue_length": MAX_QUEUE_LENGTH if MAX_QUEUE_LENGTH > 0 else "unlimited",
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": get_queue_length(),
                         "build_number": BUILD_NUMBER  # Add build number to response
                     }, 202
             return wrapper
         return decorator
 
     app.queue_task = queue_task
+    app.get_queue_stats = get_queue_stats
+    app.get_job = get_job
+    app.cancel_job = cancel_job
+    app.get_dedup_stats = job_deduplicator.stats
 
     # Import blueprints
     from routes.media_to_mp3 import convert_bp
@@ -143,6 +550,8 @@ def create_app():
     from routes.v1.image.transform.image_to_video import v1_image_transform_video_bp
     from routes.v1.toolkit.test import v1_toolkit_test_bp
     from routes.v1.toolkit.authenticate import v1_toolkit_auth_bp
+    from routes.v1.toolkit.metrics import v1_toolkit_metrics_bp
+    from routes.v1.toolkit.job_status import v1_toolkit_job_status_bp
     from routes.v1.code.execute.execute_python import v1_code_execute_bp
 
     app.register_blueprint(v1_ffmpeg_compose_bp)
@@ -154,8 +563,20 @@ def create_app():
     app.register_blueprint(v1_image_transform_video_bp)
     app.register_blueprint(v1_toolkit_test_bp)
     app.register_blueprint(v1_toolkit_auth_bp)
+    app.register_blueprint(v1_toolkit_metrics_bp)
+    app.register_blueprint(v1_toolkit_job_status_bp)
     app.register_blueprint(v1_code_execute_bp)
 
+    # Pick up jobs persisted by workers that are gone, once every task function is registered
+    if persistent_queue:
+        recover_jobs(persistent_queue.recover())
+        persistent_queue.start_heartbeat(recover_jobs, JOB_RETENTION_SECONDS)
+
+    # Enforce deadlines of running jobs and apply cancel requests made through other workers
+    start_watchdog(persistent_queue.cancel_requests if persistent_queue else None)
+    # Remove scratch directories left behind by jobs of workers that died
+    start_janitor()
+
     return app
 
 app = create_app()
@@ -2,7 +2,27 @@ from flask import request, jsonify, current_app
 from functools import wraps
 import jsonschema
 
+# Job control fields accepted by every endpoint on top of its own schema
+QUEUE_CONTROL_PROPERTIES = {
+    # Seconds after the request is accepted, or an ISO 8601 timestamp, after which the job is abandoned
+    "deadline": {
+        "anyOf": [
+            {"type": "number", "exclusiveMinimum": 0},
+            {"type": "string", "pattern": r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:\d{2})?$"}
+        ]
+    },
+    # Queue priority from 0 (lowest) to 9 (highest); defaults per API key or QUEUE_DEFAULT_PRIORITY
+    "priority": {"type": "integer", "minimum": 0, "maximum": 9}
+}
+
+def with_control_properties(schema):
+    """Allow the job control fields in schemas that otherwise reject unknown properties."""
+    if schema.get("type") != "object" or schema.get("additionalProperties", True):
+        return schema
+    return {**schema, "properties": {**QUEUE_CONTROL_PROPERTIES, **schema.get("properties", {})}}
+
 def validate_payload(schema):
+    schema = with_control_properties(schema)
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -17,9 +37,16 @@ def validate_payload(schema):
         return decorated_function
     return decorator
 
-def queue_task_wrapper(bypass_queue=False):
+# Queued task functions by "module.name", so persisted jobs can be re-run after a restart
+TASK_FUNCTIONS = {}
+
+def get_task_key(f):
+    return f"{f.__module__}.{f.__name__}"
+
+def queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode', dedup=False):
     def decorator(f):
+        TASK_FUNCTIONS[get_task_key(f)] = f
         def wrapper(*args, **kwargs):
-            return current_app.queue_task(bypass_queue=bypass_queue)(f)(*args, **kwargs)
+            return current_app.queue_task(bypass_queue=bypass_queue, resource_class=resource_class, dedup=dedup)(f)(*args, **kwargs)
         return wrapper
     return decorator
\ No newline at end of file
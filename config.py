@@ -6,64 +6,24 @@ API_KEY = os.environ.get('API_KEY', 'default-dev-key')
 # Storage settings
 UPLOAD_FOLDER = os.path.join('static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# HTTP connections each cloud storage client keeps open for concurrent uploads
+STORAGE_MAX_POOL_CONNECTIONS = int(os.environ.get('STORAGE_MAX_POOL_CONNECTIONS', 32))
+# Storage provider for outputs: 'gcp', 's3' or 'local'; unset picks the first one that is configured
+STORAGE_PROVIDER = os.environ.get('STORAGE_PROVIDER', '').lower()
+# Name uploaded outputs by the SHA-256 of their content and skip uploads of objects that already exist
+STORAGE_CONTENT_ADDRESSED = os.environ.get('STORAGE_CONTENT_ADDRESSED', 'false').lower() in ('1', 'true')
+# Directory the local provider publishes outputs into, and the URL that directory is served under
+LOCAL_STORAGE_PATH = os.environ.get('LOCAL_STORAGE_PATH', os.path.join('static', 'processed'))
+LOCAL_STORAGE_BASE_URL = os.environ.get('LOCAL_STORAGE_BASE_URL', '/static/processed')
 
 def validate_env_vars(provider):
-    """Simplified validation for local storage"""
-    return True
-
-#The following code is removed because it is no longer needed for local storage.
-# GCP environment variables
-#GCP_SA_CREDENTIALS = os.environ.get('GCP_SA_CREDENTIALS', '')
-#GCP_BUCKET_NAME = os.environ.get('GCP_BUCKET_NAME', '')
-#
-# S3 (DigitalOcean Spaces) environment variables
-#S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
-#S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY', '')
-#S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY', '')
-#
-#def validate_env_vars(provider):
-#    """ Validate the necessary environment variables for the selected storage provider """
-#    required_vars = {
-#        'GCP': ['GCP_BUCKET_NAME', 'GCP_SA_CREDENTIALS'],
-#        'S3': ['S3_ENDPOINT_URL', 'S3_ACCESS_KEY', 'S3_SECRET_KEY']
-#    }
-#    
-#    missing_vars = [var for var in required_vars[provider] if not os.getenv(var)]
-#    if missing_vars:
-#        raise ValueError(f"Missing environment variables for {provider} storage: {', '.join(missing_vars)}")
-#
-#class CloudStorageProvider:
-#    """ Abstract CloudStorageProvider class to define the upload_file method """
-#    def upload_file(self, file_path: str) -> str:
-#        raise NotImplementedError("upload_file must be implemented by subclasses")
-#
-#class GCPStorageProvider(CloudStorageProvider):
-#    """ GCP-specific cloud storage provider """
-#    def __init__(self):
-#        self.bucket_name = os.getenv('GCP_BUCKET_NAME')
-#
-#    def upload_file(self, file_path: str) -> str:
-#        from services.gcp_toolkit import upload_to_gcs
-#        return upload_to_gcs(file_path, self.bucket_name)
-#
-#class S3CompatibleProvider(CloudStorageProvider):
-#    """ S3-compatible storage provider (e.g., DigitalOcean Spaces) """
-#    def __init__(self):
-#        self.bucket_name = os.getenv('S3_BUCKET_NAME')
-#        self.region = os.getenv('S3_REGION')
-#        self.endpoint_url = os.getenv('S3_ENDPOINT_URL')
-#        self.access_key = os.getenv('S3_ACCESS_KEY')
-#        self.secret_key = os.getenv('S3_SECRET_KEY')
-#
-#    def upload_file(self, file_path: str) -> str:
-#        from services.s3_toolkit import upload_to_s3
-#        return upload_to_s3(file_path, self.bucket_name, self.region, self.endpoint_url, self.access_key, self.secret_key)
-#
-#def get_storage_provider() -> CloudStorageProvider:
-#    """ Get the appropriate storage provider based on the available environment variables """
-#    if os.getenv('S3_BUCKET_NAME'):
-#        validate_env_vars('S3')
-#        return S3CompatibleProvider()
-#    else:
-#        validate_env_vars('GCP')
-#        return GCPStorageProvider()
\ No newline at end of file
+    """ Validate the necessary environment variables for the selected storage provider """
+    required_vars = {
+        'GCP': ['GCP_BUCKET_NAME', 'GCP_SA_CREDENTIALS'],
+        'S3': ['S3_ENDPOINT_URL', 'S3_ACCESS_KEY', 'S3_SECRET_KEY'],
+        'LOCAL': []
+    }
+    
+    missing_vars = [var for var in required_vars[provider] if not os.getenv(var)]
+    if missing_vars:
+        raise ValueError(f"Missing environment variables for {provider} storage: {', '.join(missing_vars)}")
@@ -24,7 +24,7 @@ logger = logging.getLogger(__name__)
     "required": ["video_url", "audio_url"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode')
 def audio_mixing(job_id, data):
     video_url = data.get('video_url')
     audio_url = data.get('audio_url')
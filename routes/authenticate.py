@@ -8,7 +8,7 @@ auth_bp = Blueprint('auth', __name__)
 API_KEY = os.environ.get('API_KEY')
 
 @auth_bp.route('/authenticate', methods=['GET'])
-@queue_task_wrapper(bypass_queue=True)
+@queue_task_wrapper(bypass_queue=True, resource_class='light')
 def authenticate_endpoint(**kwargs):
     api_key = request.headers.get('X-API-Key')
     if api_key == API_KEY:
@@ -4,6 +4,7 @@ import logging
 from services.caption_video import process_captioning
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.payload_logging import log_payload
 import os
 
 caption_bp = Blueprint('caption', __name__)
@@ -38,7 +39,7 @@ logger = logging.getLogger(__name__)
     ],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode', dedup=True)
 def caption_video(job_id, data):
     video_url = data['video_url']
     caption_srt = data.get('srt')
@@ -48,7 +49,7 @@ def caption_video(job_id, data):
     id = data.get('id')
 
     logger.info(f"Job {job_id}: Received captioning request for {video_url}")
-    logger.info(f"Job {job_id}: Options received: {options}")
+    log_payload(logger, logging.INFO, f"Job {job_id}: Options received", options, fields=None)
 
     if caption_ass is not None:
         captions = caption_ass
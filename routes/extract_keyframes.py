@@ -20,7 +20,7 @@ logger = logging.getLogger(__name__)
     "required": ["video_url"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode')
 def extract_keyframes(job_id, data):
     video_url = data.get('video_url')
     webhook_url = data.get('webhook_url')
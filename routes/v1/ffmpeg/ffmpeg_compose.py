@@ -94,7 +94,7 @@ logger = logging.getLogger(__name__)
     "required": ["inputs", "outputs"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode')
 def ffmpeg_api(job_id, data):
     logger.info(f"Job {job_id}: Received flexible FFmpeg request")
 
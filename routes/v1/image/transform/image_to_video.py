@@ -3,7 +3,6 @@ from app_utils import *
 import logging
 from services.v1.image.transform.image_to_video import process_image_to_video
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
 
 v1_image_transform_video_bp = Blueprint('v1_image_transform_video', __name__)
 logger = logging.getLogger(__name__)
@@ -23,7 +22,7 @@ logger = logging.getLogger(__name__)
     "required": ["image_url"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode')
 def image_to_video(job_id, data):
     image_url = data.get('image_url')
     length = data.get('length', 5)
@@ -35,14 +34,11 @@ def image_to_video(job_id, data):
     logger.info(f"Job {job_id}: Received image to video request for {image_url}")
 
     try:
-        # Process image to video conversion
-        output_filename = process_image_to_video(
-            image_url, length, frame_rate, zoom_speed, job_id, webhook_url
+        # Process image to video conversion and upload the result
+        cloud_url = process_image_to_video(
+            image_url, length, frame_rate, zoom_speed, job_id, webhook_url, upload=True
         )
 
-        # Upload the resulting file using the unified upload_file() method
-        cloud_url = upload_file(output_filename)
-
         # Log the successful upload
         logger.info(f"Job {job_id}: Converted video uploaded to cloud storage: {cloud_url}")
 
@@ -22,7 +22,7 @@ logger = logging.getLogger(__name__)
     "required": ["media_url"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='whisper', dedup=True)
 def generate_srt(job_id, data):
     media_url = data['media_url']
     language = data.get('language', 'auto')
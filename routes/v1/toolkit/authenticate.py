@@ -8,7 +8,7 @@ v1_toolkit_auth_bp = Blueprint('v1_toolkit_auth', __name__)
 API_KEY = os.environ.get('API_KEY')
 
 @v1_toolkit_auth_bp.route('/v1/toolkit/authenticate', methods=['GET'])
-@queue_task_wrapper(bypass_queue=True)
+@queue_task_wrapper(bypass_queue=True, resource_class='light')
 def authenticate_endpoint(**kwargs):
     api_key = request.headers.get('X-API-Key')
     if api_key == API_KEY:
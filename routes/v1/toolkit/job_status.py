@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify, request, current_app
+from app_utils import validate_payload
+import logging
+from services.authentication import authenticate
+
+v1_toolkit_job_status_bp = Blueprint('v1_toolkit_job_status', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/job/<job_id>', methods=['GET'])
+@authenticate
+def get_job_status(job_id):
+    job = current_app.get_job(job_id)
+    if job is None:
+        return jsonify({"code": 404, "job_id": job_id, "message": "Job not found"}), 404
+    return jsonify({"code": 200, "job_id": job_id, "response": job, "message": "success"}), 200
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/jobs/status', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "job_ids": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": 1,
+            "maxItems": 100
+        }
+    },
+    "required": ["job_ids"],
+    "additionalProperties": False
+})
+def get_jobs_status():
+    job_ids = request.json['job_ids']
+    jobs = {job_id: current_app.get_job(job_id) for job_id in job_ids}
+    return jsonify({"code": 200, "response": jobs, "message": "success"}), 200
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/job/<job_id>', methods=['DELETE'])
+@authenticate
+def cancel_job(job_id):
+    job = current_app.cancel_job(job_id)
+    if job is None:
+        return jsonify({"code": 404, "job_id": job_id, "message": "Job not found"}), 404
+    if job['state'] not in ('queued', 'running'):
+        return jsonify({"code": 409, "job_id": job_id, "message": f"Job already {job['state']}"}), 409
+    logger.info(f"Job {job_id}: cancel requested while {job['state']}")
+    return jsonify({"code": 200, "job_id": job_id, "message": "cancelled"}), 200
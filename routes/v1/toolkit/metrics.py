@@ -0,0 +1,35 @@
+from flask import Blueprint, current_app
+from app_utils import queue_task_wrapper
+import logging
+from services.authentication import authenticate
+from services.whisper_models import get_model_stats
+from services.download_cache import get_download_cache_stats
+from services.scratch_space import get_scratch_stats
+from services.cloud_storage import get_upload_stats
+from services.webhook import get_webhook_stats
+from services.transcript_cache import get_transcript_cache_stats
+from services.voice_activity import get_vad_stats
+
+v1_toolkit_metrics_bp = Blueprint('v1_toolkit_metrics', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_metrics_bp.route('/v1/toolkit/metrics', methods=['GET'])
+@authenticate
+@queue_task_wrapper(bypass_queue=True, resource_class='light')
+def toolkit_metrics(job_id, data):
+    try:
+        metrics = {
+            "queues": current_app.get_queue_stats(),
+            "whisper_models": get_model_stats(),
+            "dedup": current_app.get_dedup_stats(),
+            "download_cache": get_download_cache_stats(),
+            "transcript_cache": get_transcript_cache_stats(),
+            "vad": get_vad_stats(),
+            "scratch": get_scratch_stats(),
+            "uploads": get_upload_stats(),
+            "webhooks": get_webhook_stats()
+        }
+        return metrics, "/v1/toolkit/metrics", 200
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error collecting metrics - {str(e)}")
+        return str(e), "/v1/toolkit/metrics", 500
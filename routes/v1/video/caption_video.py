@@ -3,8 +3,7 @@ from app_utils import validate_payload, queue_task_wrapper
 import logging
 from services.v1.video.caption_video import process_captioning_v1
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
-import os
+from services.payload_logging import log_payload
 import requests  # Ensure requests is imported for webhook handling
 
 v1_video_caption_bp = Blueprint('v1_video/caption', __name__)
@@ -74,7 +73,7 @@ logger = logging.getLogger(__name__)
     "required": ["video_url"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode', dedup=True)
 def caption_video_v1(job_id, data):
     video_url = data['video_url']
     captions = data.get('captions')
@@ -85,8 +84,8 @@ def caption_video_v1(job_id, data):
     language = data.get('language', 'auto')
 
     logger.info(f"Job {job_id}: Received v1 captioning request for {video_url}")
-    logger.info(f"Job {job_id}: Settings received: {settings}")
-    logger.info(f"Job {job_id}: Replace rules received: {replace}")
+    log_payload(logger, logging.INFO, f"Job {job_id}: Settings received", settings, fields=None)
+    log_payload(logger, logging.INFO, f"Job {job_id}: Replace rules received", replace, fields=None)
 
     try:
         # Do NOT combine position and alignment. Keep them separate.
@@ -94,7 +93,7 @@ def caption_video_v1(job_id, data):
         # This ensures position and alignment remain independent keys.
         
         # Process video with the enhanced v1 service
-        output = process_captioning_v1(video_url, captions, settings, replace, job_id, language)
+        output = process_captioning_v1(video_url, captions, settings, replace, job_id, language, upload=True)
         
         if isinstance(output, dict) and 'error' in output:
             # Check if this is a font-related error by checking for 'available_fonts' key
@@ -105,18 +104,10 @@ def caption_video_v1(job_id, data):
                 # Non-font error scenario, do not return available_fonts
                 return {"error": output['error']}, "/v1/video/caption", 400
 
-        # If processing was successful, output is the file path
-        output_path = output
-        logger.info(f"Job {job_id}: Captioning process completed successfully")
-
-        # Upload the captioned video
-        cloud_url = upload_file(output_path)
+        # If processing was successful, output is the URL of the uploaded video
+        cloud_url = output
         logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {cloud_url}")
 
-        # Clean up the output file after upload
-        os.remove(output_path)
-        logger.info(f"Job {job_id}: Cleaned up local output file")
-
         return cloud_url, "/v1/video/caption", 200
 
     except Exception as e:
@@ -30,7 +30,7 @@ logger = logging.getLogger(__name__)
     "required": ["video_urls"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, resource_class='cpu-encode')
 def combine_videos(job_id, data):
     media_urls = data['video_urls']
     webhook_url = data.get('webhook_url')
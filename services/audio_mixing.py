@@ -1,21 +1,20 @@
 import os
 import subprocess
-from services.file_management import download_file
-
-STORAGE_PATH = "/tmp/"
+from services.media_input import open_media_inputs
+from services.job_control import run_process
+from services.scratch_space import get_scratch_dir
 
 def get_duration(file_path):
     cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    result = run_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     return float(result.stdout)
 
 def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
-    video_path = download_file(video_url, STORAGE_PATH)
-    audio_path = download_file(audio_url, STORAGE_PATH)
-    output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
+    video_input, audio_input = open_media_inputs([video_url, audio_url], get_scratch_dir())
+    output_path = os.path.join(get_scratch_dir(), f"{job_id}.mp4")
 
-    video_duration = get_duration(video_path)
-    audio_duration = get_duration(audio_path)
+    video_duration = get_duration(video_input.source)
+    audio_duration = get_duration(audio_input.source)
 
     # Explicitly set output duration based on output_length
     output_duration = video_duration if output_length == 'video' else audio_duration
@@ -24,10 +23,10 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd = ['ffmpeg', '-y']
 
     # Input video
-    cmd.extend(['-i', video_path])
+    cmd.extend(video_input.input_args())
 
     # Input audio
-    cmd.extend(['-i', audio_path])
+    cmd.extend(audio_input.input_args())
 
     # Video settings
     if output_length == 'audio' and audio_duration > video_duration:
@@ -57,10 +56,11 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.append(output_path)
 
     # Run FFmpeg command
-    subprocess.run(cmd, check=True)
-
-    # Clean up input files
-    os.remove(video_path)
-    os.remove(audio_path)
+    try:
+        run_process(cmd, check=True)
+    finally:
+        # Clean up input files
+        video_input.cleanup()
+        audio_input.cleanup()
 
     return output_path
\ No newline at end of file
@@ -1,49 +1,218 @@
 import os
+import time
+import hashlib
 import logging
+import threading
 from abc import ABC, abstractmethod
-from services.gcp_toolkit import upload_to_gcs
-from services.s3_toolkit import upload_to_s3
-from config import validate_env_vars
+from collections import deque
+from services.gcp_toolkit import upload_to_gcs, upload_stream_to_gcs, gcs_blob_exists, get_gcs_blob
+from services.s3_toolkit import upload_to_s3, upload_stream_to_s3, s3_object_exists, get_s3_object_url
+from services.local_storage import publish_file, publish_stream, get_local_url
+from config import validate_env_vars, STORAGE_PROVIDER, STORAGE_CONTENT_ADDRESSED, LOCAL_STORAGE_PATH, LOCAL_STORAGE_BASE_URL
 
 logger = logging.getLogger(__name__)
 
+# Number of recent uploads per provider used for the latency percentiles in /v1/toolkit/metrics
+UPLOAD_LATENCY_WINDOW = 200
+
 class CloudStorageProvider(ABC):
+    name = None
+
+    @abstractmethod
+    def upload_file(self, file_path: str, key: str = None) -> str:
+        """Upload file_path as key (default: its file name) and return its URL."""
+        pass
+
     @abstractmethod
-    def upload_file(self, file_path: str) -> str:
+    def upload_stream(self, stream, filename: str) -> str:
+        pass
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def get_url(self, key: str) -> str:
         pass
 
 class GCPStorageProvider(CloudStorageProvider):
+    name = 'gcp'
+
     def __init__(self):
         self.bucket_name = os.getenv('GCP_BUCKET_NAME')
 
-    def upload_file(self, file_path: str) -> str:
-        return upload_to_gcs(file_path, self.bucket_name)
+    def upload_file(self, file_path: str, key: str = None) -> str:
+        return upload_to_gcs(file_path, self.bucket_name, key)
+
+    def upload_stream(self, stream, filename: str) -> str:
+        return upload_stream_to_gcs(stream, filename, self.bucket_name)
+
+    def exists(self, key: str) -> bool:
+        return gcs_blob_exists(key, self.bucket_name)
+
+    def get_url(self, key: str) -> str:
+        return get_gcs_blob(key, self.bucket_name).public_url
 
 class S3CompatibleProvider(CloudStorageProvider):
+    name = 's3'
+
     def __init__(self):
         self.endpoint_url = os.getenv('S3_ENDPOINT_URL')
         self.access_key = os.getenv('S3_ACCESS_KEY')
         self.secret_key = os.getenv('S3_SECRET_KEY')
 
-    def upload_file(self, file_path: str) -> str:
-        return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key)
+    def upload_file(self, file_path: str, key: str = None) -> str:
+        return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key, key)
+
+    def upload_stream(self, stream, filename: str) -> str:
+        return upload_stream_to_s3(stream, filename, self.endpoint_url, self.access_key, self.secret_key)
+
+    def exists(self, key: str) -> bool:
+        return s3_object_exists(key, self.endpoint_url, self.access_key, self.secret_key)
+
+    def get_url(self, key: str) -> str:
+        return get_s3_object_url(key, self.endpoint_url)
+
+class LocalStorageProvider(CloudStorageProvider):
+    """
+    Publishes outputs into a directory served by this host (by default Flask's static
+    folder). Files are hard-linked in rather than copied, so publishing costs no I/O when
+    the directory is on the same filesystem as the scratch space.
+    """
+    name = 'local'
+
+    def __init__(self, directory=None, base_url=None):
+        self.directory = directory or LOCAL_STORAGE_PATH
+        self.base_url = base_url or LOCAL_STORAGE_BASE_URL
+
+    def upload_file(self, file_path: str, key: str = None) -> str:
+        return publish_file(file_path, self.directory, self.base_url, key)
+
+    def upload_stream(self, stream, filename: str) -> str:
+        return publish_stream(stream, self.directory, self.base_url, filename)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.directory, key))
+
+    def get_url(self, key: str) -> str:
+        return get_local_url(self.base_url, key)
+
+STORAGE_PROVIDERS = {'gcp': GCPStorageProvider, 's3': S3CompatibleProvider, 'local': LocalStorageProvider}
+
+_provider = None
+_provider_lock = threading.Lock()
+_upload_stats = {}
+_stats_lock = threading.Lock()
 
 def get_storage_provider() -> CloudStorageProvider:
-    try:
-        validate_env_vars('GCP')
-        return GCPStorageProvider()
-    except ValueError:
-        validate_env_vars('S3')
-        return S3CompatibleProvider()
+    """Return the process-wide storage provider, chosen on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if STORAGE_PROVIDER:
+                if STORAGE_PROVIDER not in STORAGE_PROVIDERS:
+                    raise ValueError(f"Unknown STORAGE_PROVIDER: {STORAGE_PROVIDER}")
+                validate_env_vars(STORAGE_PROVIDER.upper())
+                _provider = STORAGE_PROVIDERS[STORAGE_PROVIDER]()
+            else:
+                # First provider whose settings are complete; local storage needs none
+                for name, provider_class in STORAGE_PROVIDERS.items():
+                    try:
+                        validate_env_vars(name.upper())
+                    except ValueError:
+                        continue
+                    _provider = provider_class()
+                    break
+            logger.info(f"Using {_provider.name} storage provider")
+        return _provider
+
+def record_upload(provider_name, size, duration, failed=False, deduplicated=False):
+    with _stats_lock:
+        stats = _upload_stats.setdefault(provider_name, {
+            "uploads": 0, "failures": 0, "bytes": 0, "total_time": 0.0, "deduplicated": 0, "bytes_saved": 0,
+            "latencies": deque(maxlen=UPLOAD_LATENCY_WINDOW)
+        })
+        if failed:
+            stats["failures"] += 1
+            return
+        if deduplicated:
+            stats["deduplicated"] += 1
+            stats["bytes_saved"] += size
+            return
+        stats["uploads"] += 1
+        stats["bytes"] += size
+        stats["total_time"] += duration
+        stats["latencies"].append(duration)
+
+def get_upload_stats():
+    """Return upload counts, throughput and latency percentiles per provider for this worker."""
+    with _stats_lock:
+        providers = {}
+        for name, stats in _upload_stats.items():
+            latencies = sorted(stats["latencies"])
+            providers[name] = {
+                "uploads": stats["uploads"],
+                "failures": stats["failures"],
+                "bytes": stats["bytes"],
+                "deduplicated": stats["deduplicated"],
+                "bytes_saved": stats["bytes_saved"],
+                "avg_seconds": round(stats["total_time"] / stats["uploads"], 3) if stats["uploads"] else None,
+                "p50_seconds": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "p95_seconds": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                "max_seconds": round(latencies[-1], 3) if latencies else None,
+                "bytes_per_second": round(stats["bytes"] / stats["total_time"]) if stats["total_time"] else None
+            }
+        return {"provider": _provider.name if _provider else None, "providers": providers}
+
+def get_content_key(file_path: str) -> str:
+    """Object name for content-addressed storage: SHA-256 of the content plus the file's extension."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return f"{digest.hexdigest()}{os.path.splitext(file_path)[1].lower()}"
 
 def upload_file(file_path: str) -> str:
+    """
+    Upload file_path and return its URL. With STORAGE_CONTENT_ADDRESSED the object is
+    named after its content hash, and an output that was already uploaded is not sent
+    again: its existing URL is returned after a HEAD request.
+    """
     provider = get_storage_provider()
+    start_time = time.time()
     try:
         logger.info(f"Uploading file to cloud storage: {file_path}")
-        url = provider.upload_file(file_path)
-        logger.info(f"File uploaded successfully: {url}")
+        size = os.path.getsize(file_path)
+        key = None
+        if STORAGE_CONTENT_ADDRESSED:
+            key = get_content_key(file_path)
+            if provider.exists(key):
+                url = provider.get_url(key)
+                record_upload(provider.name, size, time.time() - start_time, deduplicated=True)
+                logger.info(f"Identical file already in storage, skipping upload: {url}")
+                return url
+        url = provider.upload_file(file_path, key)
+        duration = time.time() - start_time
+        record_upload(provider.name, size, duration)
+        logger.info(f"File uploaded successfully in {duration:.2f}s: {url}")
         return url
     except Exception as e:
+        record_upload(provider.name, 0, time.time() - start_time, failed=True)
         logger.error(f"Error uploading file to cloud storage: {e}")
         raise
-    
\ No newline at end of file
+
+def upload_stream(stream, filename: str) -> str:
+    """Upload everything read from a file-like stream (e.g. ffmpeg's stdout) as filename."""
+    provider = get_storage_provider()
+    start_time = time.time()
+    try:
+        logger.info(f"Streaming upload to cloud storage: {filename}")
+        url = provider.upload_stream(stream, filename)
+        duration = time.time() - start_time
+        record_upload(provider.name, stream.tell(), duration)
+        logger.info(f"Stream uploaded successfully in {duration:.2f}s: {url}")
+        return url
+    except Exception as e:
+        record_upload(provider.name, 0, time.time() - start_time, failed=True)
+        logger.error(f"Error streaming upload to cloud storage: {e}")
+        raise
@@ -0,0 +1,216 @@
+import os
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directory of the host-wide cache of downloaded inputs; shared by all workers
+DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', '/tmp/nca_download_cache')
+# Disk space the cache may use before least recently used files are evicted (0 disables the cache)
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+# Seconds a cached URL is reused without asking the origin whether it changed (0 always revalidates)
+DOWNLOAD_CACHE_FRESH_SECONDS = int(os.environ.get('DOWNLOAD_CACHE_FRESH_SECONDS', 0))
+
+class DownloadCache:
+    """
+    Content-addressed cache of downloaded files.
+    Files are stored once per SHA-256 under blobs/ and indexed by URL together with the
+    ETag/Last-Modified validators the origin sent. Callers get hard links to the blobs,
+    so a file's link count doubles as its reference count: a blob that is still linked
+    from a job's scratch space is never evicted, and deleting the job's copy cannot
+    damage the cache.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(directory, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.path = os.path.join(directory, 'index.db')
+        self._stats = {"hits": 0, "misses": 0, "revalidations": 0, "stores": 0, "evictions": 0, "bytes_served": 0}
+        self._stats_lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    sha256 TEXT NOT NULL,
+                    validated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS urls_sha256 ON urls (sha256)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256)
+
+    def lookup(self, url):
+        """Return the cache entry for url ({'etag', 'last_modified', 'sha256', 'fresh'}), or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM urls WHERE url = ?", (url,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or not os.path.exists(self._blob_path(row['sha256'])):
+            return None
+        entry = dict(row)
+        entry['fresh'] = time.time() - row['validated_at'] < DOWNLOAD_CACHE_FRESH_SECONDS
+        return entry
+
+    def get_validators(self, entry):
+        """Conditional request headers that let the origin answer 304 if the cached file is current."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def link(self, url, entry, destination, revalidated=False):
+        """
+        Place the cached file for url at destination. Returns False if the blob was evicted
+        in the meantime, in which case the caller downloads the file again.
+        """
+        blob_path = self._blob_path(entry['sha256'])
+        try:
+            try:
+                os.link(blob_path, destination)
+            except OSError as e:
+                if isinstance(e, FileNotFoundError):
+                    raise
+                # Cache on another filesystem: fall back to a private copy
+                shutil.copyfile(blob_path, destination)
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (now, entry['sha256']))
+            if revalidated:
+                conn.execute("UPDATE urls SET validated_at = ? WHERE url = ?", (now, url))
+        finally:
+            conn.close()
+        self._count("hits")
+        self._count("bytes_served", os.path.getsize(destination))
+        if revalidated:
+            self._count("revalidations")
+        return True
+
+    def store(self, url, etag, last_modified, sha256, file_path):
+        """Add a freshly downloaded file to the cache by linking it in under its content hash."""
+        size = os.path.getsize(file_path)
+        if size > self.max_bytes:
+            return
+        blob_path = self._blob_path(sha256)
+        if not os.path.exists(blob_path):
+            temp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}"
+            try:
+                os.link(file_path, temp_path)
+            except OSError:
+                shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, blob_path)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO blobs (sha256, size, last_used) VALUES (?, ?, ?)", (sha256, size, now))
+            conn.execute("INSERT OR REPLACE INTO urls (url, etag, last_modified, sha256, validated_at) VALUES (?, ?, ?, ?, ?)",
+                         (url, etag, last_modified, sha256, now))
+        finally:
+            conn.close()
+        self._count("stores")
+        self.evict()
+
+    def record_miss(self):
+        self._count("misses")
+
+    def evict(self):
+        """Delete least recently used blobs that no job holds a link to until the cache fits max_bytes."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total > self.max_bytes:
+                for row in conn.execute("SELECT sha256, size FROM blobs ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    blob_path = self._blob_path(row['sha256'])
+                    try:
+                        if os.stat(blob_path).st_nlink > 1:
+                            continue  # Still in use by a job
+                        os.remove(blob_path)
+                    except FileNotFoundError:
+                        pass
+                    conn.execute("DELETE FROM blobs WHERE sha256 = ?", (row['sha256'],))
+                    conn.execute("DELETE FROM urls WHERE sha256 = ?", (row['sha256'],))
+                    total -= row['size']
+                    self._count("evictions")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            files, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            urls = conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        finally:
+            conn.close()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "size_bytes": size,
+            "files": files,
+            "urls": urls,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+            **stats
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_download_cache():
+    """Return the process-wide download cache, or None if it is disabled or unusable."""
+    global _cache
+    if DOWNLOAD_CACHE_MAX_BYTES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = DownloadCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Download cache disabled: {e}")
+                return None
+        return _cache
+
+def get_download_cache_stats():
+    cache = get_download_cache()
+    return cache.stats() if cache else {"enabled": False}
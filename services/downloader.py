@@ -0,0 +1,233 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import requests
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from requests.adapters import HTTPAdapter
+from services.job_control import JobCancelled, get_current_job_id, get_cancel_reason, bind_job
+
+logger = logging.getLogger(__name__)
+
+# Number of parallel Range requests used for one large download
+DOWNLOAD_SEGMENTS = int(os.environ.get('DOWNLOAD_SEGMENTS', 4))
+# Files smaller than this are fetched with a single request
+DOWNLOAD_PARALLEL_MIN_BYTES = int(os.environ.get('DOWNLOAD_PARALLEL_MIN_BYTES', 32 * 1024 * 1024))
+# Bytes read from the network and written to disk per call
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+# Times a broken transfer is resumed from where it stopped before the download fails
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 3))
+# Seconds to wait for a connection or for the next bytes from the server
+DOWNLOAD_TIMEOUT = int(os.environ.get('DOWNLOAD_TIMEOUT', 60))
+# Pooled connections kept per host
+DOWNLOAD_POOL_SIZE = int(os.environ.get('DOWNLOAD_POOL_SIZE', 16))
+# Inputs of one multi-input job fetched at the same time
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', 8))
+# Files fetched from one host at the same time, across all jobs of a worker
+DOWNLOAD_PER_HOST_LIMIT = int(os.environ.get('DOWNLOAD_PER_HOST_LIMIT', 4))
+
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+_sessions = {}
+_host_slots = {}
+_sessions_lock = threading.Lock()
+
+def _get_host(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def get_session(url):
+    """Return the shared Session for url's host, so connections and TLS sessions are reused across jobs."""
+    host = _get_host(url)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DOWNLOAD_POOL_SIZE)
+            session.mount(host, adapter)
+            _sessions[host] = session
+        return session
+
+class DownloadResult:
+    """Outcome of download_to_file. A 304 status means the conditional headers matched and nothing was written."""
+    def __init__(self, status_code, headers, size=0, sha256=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.size = size
+        self.sha256 = sha256
+
+def _check_stopped(job_id, stop):
+    reason = get_cancel_reason(job_id) if job_id else None
+    if reason:
+        raise JobCancelled(reason)
+    if stop and stop.is_set():
+        raise JobCancelled('stopped after another segment failed')
+
+def _get_range_validator(headers):
+    """Value for If-Range so resumed or parallel segments fail rather than mix two versions of a file."""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+def _fetch_range(session, url, fd, start, end, validator, job_id, digest=None, response=None, stop=None):
+    """
+    Write bytes start..end (end None = to EOF) of url into fd at their offsets. A broken
+    connection is resumed with a Range request from the last byte written.
+    """
+    offset = start
+    attempts = 0
+    while end is None or offset <= end:
+        try:
+            if response is None:
+                headers = {'Range': f"bytes={offset}-{'' if end is None else end}"}
+                if validator:
+                    headers['If-Range'] = validator
+                response = session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+                if response.status_code != 206:
+                    raise requests.HTTPError(f"Expected 206 for a range of {url}, got {response.status_code}", response=response)
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                _check_stopped(job_id, stop)
+                if end is not None:
+                    chunk = chunk[:end + 1 - offset]
+                os.pwrite(fd, chunk, offset)
+                if digest:
+                    digest.update(chunk)
+                offset += len(chunk)
+                if end is not None and offset > end:
+                    break
+            else:
+                if end is not None and offset <= end:
+                    raise requests.exceptions.ChunkedEncodingError(f"Connection closed at byte {offset} of {url}")
+                return offset
+        except RETRYABLE_ERRORS as e:
+            attempts += 1
+            if attempts > DOWNLOAD_RETRIES or not validator:
+                if stop:
+                    stop.set()
+                raise
+            logger.warning(f"Download of {url} interrupted at byte {offset} ({e}); resuming (attempt {attempts})")
+            time.sleep(min(2 ** attempts, 10))
+        except BaseException:
+            if stop:
+                stop.set()
+            raise
+        finally:
+            if response is not None:
+                response.close()
+                response = None
+    return offset
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def download_to_file(url, path, headers=None, compute_hash=False):
+    """
+    Download url to path through the host's pooled session. Large files from servers that
+    accept byte ranges are fetched in DOWNLOAD_SEGMENTS parallel segments written in place
+    with pwrite; interrupted transfers are resumed instead of restarted.
+    """
+    job_id = get_current_job_id()
+    session = get_session(url)
+    response = session.get(url, headers=headers or {}, stream=True, timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code == 304:
+        response.close()
+        return DownloadResult(304, response.headers)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+
+    size = int(response.headers['Content-Length']) if response.headers.get('Content-Length', '').isdigit() else None
+    validator = _get_range_validator(response.headers) if response.headers.get('Accept-Ranges') == 'bytes' else None
+    if response.headers.get('Content-Encoding', 'identity').strip().lower() != 'identity':
+        # Content-Length and byte ranges count the encoded bytes, which do not line up with the
+        # decoded bytes written to the file, so such a download is neither split nor resumed
+        size = None
+        validator = None
+    parallel = (validator is not None and size is not None and DOWNLOAD_SEGMENTS > 1
+                and size >= DOWNLOAD_PARALLEL_MIN_BYTES)
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if parallel:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, size)
+            segment_size = -(-size // DOWNLOAD_SEGMENTS)
+            segments = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+            logger.info(f"Downloading {url} ({size} bytes) in {len(segments)} parallel segments")
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+                # The first segment is read from the response that is already open
+                futures = [pool.submit(_fetch_range, session, url, fd, segments[0][0], segments[0][1], validator, job_id, None, response, stop)]
+                futures += [pool.submit(_fetch_range, session, url, fd, start, end, validator, job_id, None, None, stop)
+                            for start, end in segments[1:]]
+                for future in futures:
+                    future.result()
+            written = size
+        else:
+            digest = hashlib.sha256() if compute_hash else None
+            written = _fetch_range(session, url, fd, 0, size - 1 if size else None, validator, job_id, digest, response)
+    except BaseException:
+        os.close(fd)
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    os.close(fd)
+
+    sha256 = None
+    if compute_hash:
+        sha256 = digest.hexdigest() if not parallel else _hash_file(path)
+    return DownloadResult(response.status_code, response.headers, written, sha256)
+
+def _get_host_slot(url):
+    with _sessions_lock:
+        return _host_slots.setdefault(_get_host(url), threading.BoundedSemaphore(DOWNLOAD_PER_HOST_LIMIT))
+
+def fetch_concurrently(fetch, urls, cleanup):
+    """
+    Call fetch(url, index) for every url on a bounded pool, at most DOWNLOAD_PER_HOST_LIMIT
+    at a time per host, and return the results in input order. If any fetch fails, the
+    ones not yet started are skipped, every result that did complete is passed to
+    cleanup, and the first error is raised.
+    """
+    job_id = get_current_job_id()
+
+    def run(url, index):
+        with bind_job(job_id):
+            _check_stopped(job_id, None)
+            if not url.startswith(('http://', 'https://')):
+                return fetch(url, index)
+            with _get_host_slot(url):
+                return fetch(url, index)
+
+    if len(urls) <= 1:
+        return [fetch(url, index) for index, url in enumerate(urls)]
+
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_CONCURRENCY, len(urls))) as pool:
+        futures = [pool.submit(run, url, index) for index, url in enumerate(urls)]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = any(future.exception() for future in done)
+        if failed:
+            for future in pending:
+                future.cancel()
+            wait(futures)
+
+    if not failed:
+        return [future.result() for future in futures]
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            try:
+                cleanup(future.result())
+            except OSError:
+                pass
+    raise next(future.exception() for future in futures if not future.cancelled() and future.exception())
@@ -1,18 +1,17 @@
 import os
-import subprocess
 import json
-from services.file_management import download_file
-
-STORAGE_PATH = "/tmp/"
+from services.media_input import open_media_input
+from services.job_control import run_process
+from services.scratch_space import get_scratch_dir
 
 def process_keyframe_extraction(video_url, job_id):
-    video_path = download_file(video_url, STORAGE_PATH)
+    video_input = open_media_input(video_url, get_scratch_dir())
 
     # Extract keyframes
-    output_pattern = os.path.join(STORAGE_PATH, f"{job_id}_%03d.jpg")
+    output_pattern = os.path.join(get_scratch_dir(), f"{job_id}_%03d.jpg")
     cmd = [
         'ffmpeg',
-        '-i', video_path,
+        *video_input.input_args(),
         '-vf', f"select='eq(pict_type,I)',scale=iw*sar:ih,setsar=1",
         '-vsync', 'vfr',
         output_pattern
@@ -20,16 +19,17 @@ def process_keyframe_extraction(video_url, job_id):
 
     print(f"Images: {cmd}")
 
-    subprocess.run(cmd, check=True)
+    try:
+        run_process(cmd, check=True)
+    finally:
+        # Clean up input file
+        video_input.cleanup()
 
     # Upload keyframes to GCS and get URLs
     output_filenames = []
-    for filename in sorted(os.listdir(STORAGE_PATH)):
+    for filename in sorted(os.listdir(get_scratch_dir())):
         if filename.startswith(f"{job_id}_") and filename.endswith(".jpg"):
-            file_path = os.path.join(STORAGE_PATH, filename)
+            file_path = os.path.join(get_scratch_dir(), filename)
             output_filenames.append(file_path)
 
-    # Clean up input file
-    os.remove(video_path)
-
     return output_filenames
\ No newline at end of file
@@ -1,51 +1,98 @@
 import os
+import time
 import uuid
-import requests
-from urllib.parse import urlparse, parse_qs
+import logging
+from services.download_cache import get_download_cache
+from services.downloader import download_to_file
+from services.media_types import identify, SNIFF_BYTES, IMAGE_CONTAINERS
 
-def download_file(url, storage_path="/tmp/"):
+logger = logging.getLogger(__name__)
+
+class DownloadedFile:
+    """A file fetched by download_media: where it is and what it contains."""
+    def __init__(self, path, size, mime, container=None):
+        self.path = path
+        self.size = size
+        self.mime = mime
+        # Container recognised from the file's own bytes (see services.media_types), or None
+        self.container = container
+
+    @property
+    def is_image(self):
+        return self.container in IMAGE_CONTAINERS
+
+    def __repr__(self):
+        return f"DownloadedFile({self.path!r}, size={self.size}, mime={self.mime!r}, container={self.container!r})"
+
+def describe_file(path, headers=None, url=''):
+    with open(path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    extension, mime, container = identify(head, headers, url or path)
+    return DownloadedFile(path, os.path.getsize(path), mime, container), extension
+
+def download_media(url, storage_path="/tmp/"):
+    """
+    Download url into storage_path and return a DownloadedFile. The file is named after
+    what it contains (magic bytes, then Content-Type, then the file name), so an MP3 is
+    saved as .mp3 and a PNG as .png rather than everything as .mp4.
+    """
     # Handle local file paths
     if url.startswith('file://'):
         local_path = url[7:]  # Remove 'file://' prefix
         if os.path.exists(local_path):
-            return local_path
+            return describe_file(local_path)[0]
         raise FileNotFoundError(f"Local file not found: {local_path}")
         
     # Handle local paths without protocol
     if os.path.exists(url):
-        return url
+        return describe_file(url)[0]
         
-    # For HTTP/HTTPS URLs, proceed with download
-    parsed_url = urlparse(url)
-    query_params = parse_qs(parsed_url.query)
-    
-    # Use the 'id' parameter as the filename if it exists
-    file_id = str(uuid.uuid4())
-    
-    #if not file_id:
-    #    raise ValueError("Invalid URL: 'id' parameter not found in the URL")
-    
     # Ensure the storage directory exists
     if not os.path.exists(storage_path):
         os.makedirs(storage_path)
     
-    # Use the file ID as the filename and save it in the specified storage path
-    local_filename = os.path.join(storage_path, f"{file_id}.mp4")  # Assuming mp4; adjust extension if needed
-    
-    # Download the file
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    with open(local_filename, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-    
-    return local_filename
+    # Download under a temporary name and rename once the content type is known
+    file_id = str(uuid.uuid4())
+    local_filename = os.path.join(storage_path, f"{file_id}.part")
+    headers = None
+
+    # Reuse a cached copy if the origin confirms it is unchanged
+    cache = get_download_cache()
+    entry = cache.lookup(url) if cache else None
+    if not (entry and entry['fresh'] and cache.link(url, entry, local_filename)):
+        result = download_to_file(url, local_filename, headers=cache.get_validators(entry) if entry else None,
+                                  compute_hash=cache is not None)
+        headers = result.headers
+        if result.status_code == 304 and not cache.link(url, entry, local_filename, revalidated=True):
+            # Evicted meanwhile; fetch it unconditionally
+            result = download_to_file(url, local_filename, compute_hash=True)
+            headers = result.headers
+        if result.status_code != 304 and cache:
+            cache.record_miss()
+            etag, last_modified = result.headers.get('ETag'), result.headers.get('Last-Modified')
+            if etag or last_modified:
+                try:
+                    cache.store(url, etag, last_modified, result.sha256, local_filename)
+                except Exception as e:
+                    logger.warning(f"Could not cache download of {url}: {e}")
+
+    downloaded, extension = describe_file(local_filename, headers, url)
+    downloaded.path = os.path.join(storage_path, f"{file_id}{extension}")
+    os.rename(local_filename, downloaded.path)
+    return downloaded
+
+def download_file(url, storage_path="/tmp/"):
+    """Download url into storage_path and return the local path (see download_media)."""
+    return download_media(url, storage_path).path
 
 
-def delete_old_files():
+def delete_old_files(storage_path="/tmp/", max_age=3600):
+    """Remove files directly under storage_path that were last modified more than max_age seconds ago."""
     now = time.time()
-    for filename in os.listdir(STORAGE_PATH):
-        file_path = os.path.join(STORAGE_PATH, filename)
-        if os.path.isfile(file_path) and os.stat(file_path).st_mtime < now - 3600:
-            os.remove(file_path)
+    for filename in os.listdir(storage_path):
+        file_path = os.path.join(storage_path, filename)
+        try:
+            if os.path.isfile(file_path) and os.stat(file_path).st_mtime < now - max_age:
+                os.remove(file_path)
+        except FileNotFoundError:
+            pass
@@ -1,8 +1,13 @@
 import os
 import json
 import logging
+import threading
 from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
+from requests.adapters import HTTPAdapter
+from config import STORAGE_MAX_POOL_CONNECTIONS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,8 +15,12 @@ logger = logging.getLogger(__name__)
 
 # GCS environment variables
 GCP_BUCKET_NAME = os.getenv('GCP_BUCKET_NAME')
-STORAGE_PATH = "/tmp/"
+# Files at least this large are sent as an XML multipart upload with parts uploaded concurrently
+GCS_MULTIPART_THRESHOLD = int(os.environ.get('GCS_MULTIPART_THRESHOLD', 64 * 1024 * 1024))
+GCS_UPLOAD_PART_SIZE = int(os.environ.get('GCS_UPLOAD_PART_SIZE', 32 * 1024 * 1024))
+GCS_UPLOAD_CONCURRENCY = int(os.environ.get('GCS_UPLOAD_CONCURRENCY', 8))
 gcs_client = None
+_client_lock = threading.Lock()
 
 def initialize_gcp_client():
     GCP_SA_CREDENTIALS = os.getenv('GCP_SA_CREDENTIALS')
@@ -29,25 +38,73 @@ def initialize_gcp_client():
             credentials_info,
             scopes=GCS_SCOPES
         )
-        return storage.Client(credentials=gcs_credentials)
+        # Size the connection pool for concurrent uploads instead of the requests default of 10
+        http = AuthorizedSession(gcs_credentials)
+        http.mount('https://', HTTPAdapter(pool_connections=STORAGE_MAX_POOL_CONNECTIONS, pool_maxsize=STORAGE_MAX_POOL_CONNECTIONS))
+        return storage.Client(credentials=gcs_credentials, _http=http)
     except Exception as e:
         logger.error(f"Failed to initialize GCS client: {e}")
         return None
 
-# Initialize the GCS client
-gcs_client = initialize_gcp_client()
+def get_gcs_client():
+    """Return the shared GCS client, creating it on first use."""
+    global gcs_client
+    with _client_lock:
+        if gcs_client is None:
+            gcs_client = initialize_gcp_client()
+        return gcs_client
 
-def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
-    if not gcs_client:
+def get_gcs_blob(blob_name, bucket_name=GCP_BUCKET_NAME):
+    client = get_gcs_client()
+    if not client:
+        raise ValueError("GCS client is not initialized. Skipping file upload.")
+    return client.bucket(bucket_name).blob(blob_name)
+
+def gcs_blob_exists(blob_name, bucket_name=GCP_BUCKET_NAME):
+    """Check for an object with a metadata request; nothing is downloaded."""
+    return get_gcs_blob(blob_name, bucket_name).exists()
+
+def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME, blob_name=None):
+    client = get_gcs_client()
+    if not client:
         raise ValueError("GCS client is not initialized. Skipping file upload.")
 
     try:
         logger.info(f"Uploading file to Google Cloud Storage: {file_path}")
-        bucket = gcs_client.bucket(bucket_name)
-        blob = bucket.blob(os.path.basename(file_path))
-        blob.upload_from_filename(file_path)
+        bucket = client.bucket(bucket_name)
+        blob = bucket.blob(blob_name or os.path.basename(file_path))
+        if os.path.getsize(file_path) >= GCS_MULTIPART_THRESHOLD:
+            # Threads rather than processes: the parts share this client and its connection pool.
+            # Every part is sent with its MD5, which GCS verifies before accepting it.
+            transfer_manager.upload_chunks_concurrently(
+                file_path, blob, chunk_size=GCS_UPLOAD_PART_SIZE, max_workers=GCS_UPLOAD_CONCURRENCY,
+                worker_type=transfer_manager.THREAD, checksum='md5'
+            )
+        else:
+            blob.upload_from_filename(file_path, checksum='md5')
         logger.info(f"File uploaded successfully to GCS: {blob.public_url}")
         return blob.public_url
     except Exception as e:
         logger.error(f"Error uploading file to GCS: {e}")
         raise
+
+def upload_stream_to_gcs(stream, blob_name, bucket_name=GCP_BUCKET_NAME):
+    """
+    Upload everything read from stream as blob_name with a resumable upload, sending
+    GCS_UPLOAD_PART_SIZE chunks as they are read. The upload is only finalized once the
+    stream ends, so an error raised by the stream leaves no object behind.
+    """
+    client = get_gcs_client()
+    if not client:
+        raise ValueError("GCS client is not initialized. Skipping file upload.")
+
+    try:
+        # Resumable upload chunks must be a multiple of 256 KiB
+        chunk_size = max(1, GCS_UPLOAD_PART_SIZE // (256 * 1024)) * 256 * 1024
+        blob = client.bucket(bucket_name).blob(blob_name, chunk_size=chunk_size)
+        blob.upload_from_file(stream, rewind=False, checksum='md5')
+        logger.info(f"Stream uploaded successfully to GCS: {blob.public_url}")
+        return blob.public_url
+    except Exception as e:
+        logger.error(f"Error streaming upload to GCS: {e}")
+        raise
@@ -0,0 +1,226 @@
+import os
+import time
+import signal
+import logging
+import threading
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled or ran past its deadline."""
+    def __init__(self, reason):
+        super().__init__(f"Job {reason}")
+        self.reason = reason
+
+class JobHandle:
+    """Cancellation state and child processes of a job running in this worker."""
+    def __init__(self, job_id, deadline_at=None):
+        self.job_id = job_id
+        self.deadline_at = deadline_at
+        self.cancel_reason = None
+        self.processes = set()
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_local = threading.local()
+_watchdog_started = False
+
+def get_current_job_id():
+    """Return the id of the job running on this thread, if any."""
+    return getattr(_local, 'job_id', None)
+
+@contextmanager
+def job_context(job_id, deadline_at=None):
+    """Track a job for cancellation while it runs on the current thread."""
+    handle = JobHandle(job_id, deadline_at)
+    with _jobs_lock:
+        _jobs[job_id] = handle
+    _local.job_id = job_id
+    try:
+        yield handle
+    finally:
+        _local.job_id = None
+        with _jobs_lock:
+            _jobs.pop(job_id, None)
+
+@contextmanager
+def bind_job(job_id):
+    """Run code on a helper thread (e.g. a download pool) on behalf of an already tracked job."""
+    previous = get_current_job_id()
+    _local.job_id = job_id
+    try:
+        yield
+    finally:
+        _local.job_id = previous
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def cancel_job(job_id, reason='cancelled'):
+    """Cancel a job running in this worker and kill its process trees. Returns False if it is not running here."""
+    with _jobs_lock:
+        handle = _jobs.get(job_id)
+        if handle is None:
+            return False
+        if handle.cancel_reason is None:
+            handle.cancel_reason = reason
+        processes = list(handle.processes)
+    logger.info(f"Job {job_id}: {reason}, killing {len(processes)} running process(es)")
+    for process in processes:
+        _kill(process)
+    return True
+
+def get_cancel_reason(job_id):
+    with _jobs_lock:
+        handle = _jobs.get(job_id)
+        return handle.cancel_reason if handle else None
+
+def check_cancelled():
+    """Raise JobCancelled if the job on this thread has been cancelled."""
+    reason = get_cancel_reason(get_current_job_id())
+    if reason:
+        raise JobCancelled(reason)
+
+@contextmanager
+def _tracked(process):
+    job_id = get_current_job_id()
+    with _jobs_lock:
+        handle = _jobs.get(job_id)
+        if handle:
+            handle.processes.add(process)
+    try:
+        yield
+    finally:
+        if handle:
+            with _jobs_lock:
+                handle.processes.discard(process)
+
+def run_process(cmd, check=False, capture_output=False, text=False, timeout=None, input=None, stdout=None, stderr=None):
+    """
+    Drop-in for subprocess.run that starts the command in its own process group and
+    registers it with the current job, so cancelling the job kills the whole tree.
+    """
+    check_cancelled()
+    if capture_output:
+        stdout = stderr = subprocess.PIPE
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE if input is not None else None, stdout=stdout,
+                               stderr=stderr, text=text, start_new_session=True)
+    with _tracked(process):
+        try:
+            out, err = process.communicate(input=input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            process.communicate()
+            raise
+    check_cancelled()
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd, out, err)
+    return subprocess.CompletedProcess(cmd, process.returncode, out, err)
+
+def run_ffmpeg(stream, capture_stdout=False, capture_stderr=False, overwrite_output=False, quiet=False):
+    """Drop-in for ffmpeg-python's stream.run() that registers the ffmpeg process with the current job."""
+    import ffmpeg
+    args = ffmpeg.compile(stream, overwrite_output=overwrite_output)
+    result = run_process(args,
+                         stdout=subprocess.PIPE if capture_stdout or quiet else None,
+                         stderr=subprocess.PIPE if capture_stderr or quiet else None)
+    if result.returncode:
+        raise ffmpeg.Error('ffmpeg', result.stdout, result.stderr)
+    return result.stdout, result.stderr
+
+class ProcessOutput:
+    """
+    Readable stdout of a running command. A read that reaches EOF, even one that still
+    returns data, waits for the command and raises CalledProcessError if it failed, so a
+    consumer such as an upload never mistakes the output of a failed or killed command
+    for a complete one.
+    """
+    def __init__(self, process, cmd, stderr_file):
+        self.process = process
+        self.cmd = cmd
+        self.stderr_file = stderr_file
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.process.stdout.read(size)
+        # A buffered read only comes back short at EOF, so the last chunk is checked before it is handed out
+        if size != 0 and (size is None or size < 0 or len(data) < size):
+            self.process.wait()
+            if self.process.returncode:
+                self.stderr_file.seek(0)
+                stderr = self.stderr_file.read().decode('utf-8', errors='replace')
+                raise subprocess.CalledProcessError(self.process.returncode, self.cmd, None, stderr)
+        self.position += len(data)
+        return data
+
+    def tell(self):
+        return self.position
+
+@contextmanager
+def open_process_output(cmd):
+    """
+    Start cmd like run_process, with its stdout available as a ProcessOutput while it runs.
+    The command is killed if the block exits before its output was consumed.
+    """
+    check_cancelled()
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, start_new_session=True)
+        with _tracked(process):
+            try:
+                yield ProcessOutput(process, cmd, stderr_file)
+            finally:
+                if process.poll() is None:
+                    _kill(process)
+                process.wait()
+                process.stdout.close()
+    check_cancelled()
+
+def _watchdog(poll_cancel_requests):
+    while True:
+        time.sleep(1)
+        now = time.time()
+        with _jobs_lock:
+            expired = [job_id for job_id, handle in _jobs.items()
+                       if handle.deadline_at and now > handle.deadline_at and handle.cancel_reason is None]
+        for job_id in expired:
+            cancel_job(job_id, 'deadline exceeded')
+        if poll_cancel_requests:
+            try:
+                for job_id in poll_cancel_requests():
+                    cancel_job(job_id, 'cancelled')
+            except Exception as e:
+                logger.error(f"Polling cancel requests failed: {e}")
+
+def start_watchdog(poll_cancel_requests=None):
+    """Enforce job deadlines, and apply cancel requests returned by poll_cancel_requests(), once a second."""
+    global _watchdog_started
+    if not _watchdog_started:
+        _watchdog_started = True
+        threading.Thread(target=_watchdog, args=(poll_cancel_requests,), daemon=True).start()
+
+def get_deadline_at(deadline, accepted_at):
+    """
+    Convert a request's 'deadline' into an epoch timestamp. Numbers are seconds after the
+    job was accepted; strings are ISO 8601 timestamps (naive ones are taken as UTC).
+    Raises ValueError for a deadline that is not a real date or time.
+    """
+    if deadline is None:
+        return None
+    if isinstance(deadline, (int, float)) and not isinstance(deadline, bool):
+        return accepted_at + deadline
+    if not isinstance(deadline, str):
+        raise ValueError(f"expected a number of seconds or an ISO 8601 timestamp, got {deadline!r}")
+    from datetime import datetime, timezone
+    parsed = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
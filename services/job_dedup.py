@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Coalesce identical requests onto one job and reuse recent results
+JOB_DEDUP = os.environ.get('JOB_DEDUP', 'true').lower() in ('1', 'true')
+# Seconds a completed job's result is served to identical requests
+JOB_DEDUP_TTL = int(os.environ.get('JOB_DEDUP_TTL', 600))
+# Maximum number of request fingerprints remembered per worker (least recently used dropped first)
+JOB_DEDUP_MAX_KEYS = int(os.environ.get('JOB_DEDUP_MAX_KEYS', 1000))
+
+# Per-request fields that do not change what a job produces
+DEDUP_IGNORED_FIELDS = ('id', 'webhook_url', 'deadline', 'priority')
+
+def get_dedup_key(endpoint, data, idempotency_key=None):
+    """
+    Fingerprint a request: the client's Idempotency-Key if given, otherwise a hash of the
+    canonical JSON payload without per-request fields such as 'id' and 'webhook_url'.
+    """
+    if idempotency_key:
+        material = f"{endpoint}\0key\0{idempotency_key}"
+    else:
+        payload = {k: v for k, v in data.items() if k not in DEDUP_IGNORED_FIELDS}
+        material = f"{endpoint}\0payload\0{json.dumps(payload, sort_keys=True, separators=(',', ':'))}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class JobDeduplicator:
+    """Bounded map of request fingerprints to the job that serves them, plus that job's extra subscribers."""
+    def __init__(self, max_keys=JOB_DEDUP_MAX_KEYS, ttl=JOB_DEDUP_TTL):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._keys = OrderedDict()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._stats = {"joined": 0, "cached": 0, "misses": 0}
+
+    def is_reusable(self, job):
+        """A job can serve a duplicate while it is active, or for ttl seconds after completing."""
+        if job is None:
+            return False
+        if job.get('state') in ('queued', 'running'):
+            return True
+        return job.get('state') == 'completed' and time.time() - (job.get('finished_at') or 0) <= self.ttl
+
+    def claim(self, key, job_id, find_job):
+        """
+        Return the record of a reusable job for key, looked up with find_job(key, job_id_or_None),
+        or register job_id as the job serving key and return None.
+        """
+        with self._lock:
+            existing_id = self._keys.get(key)
+            job = find_job(key, existing_id)
+            if self.is_reusable(job):
+                self._keys[key] = job['job_id']
+                self._keys.move_to_end(key)
+                self._stats["joined" if job['state'] != 'completed' else "cached"] += 1
+                return job
+            self._keys[key] = job_id
+            self._keys.move_to_end(key)
+            while self.max_keys > 0 and len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+            self._stats["misses"] += 1
+            return None
+
+    def add_subscriber(self, job_id, subscriber):
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscriber)
+
+    def pop_subscribers(self, job_id):
+        with self._lock:
+            return self._subscribers.pop(job_id, [])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": JOB_DEDUP,
+                "ttl": self.ttl,
+                "keys": len(self._keys),
+                "waiting_subscribers": sum(len(s) for s in self._subscribers.values()),
+                **self._stats
+            }
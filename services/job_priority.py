@@ -0,0 +1,82 @@
+import os
+import heapq
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Priority of jobs that do not set one; higher runs first
+QUEUE_DEFAULT_PRIORITY = int(os.environ.get('QUEUE_DEFAULT_PRIORITY', 5))
+QUEUE_MIN_PRIORITY = 0
+QUEUE_MAX_PRIORITY = 9
+# Seconds of waiting that raise a job's priority by one level, so low priority jobs are not starved (0 disables aging)
+QUEUE_PRIORITY_AGING = float(os.environ.get('QUEUE_PRIORITY_AGING', 60))
+# Default priorities per API key, e.g. "batch-key:2,interactive-key:8"
+QUEUE_KEY_PRIORITIES = os.environ.get('QUEUE_KEY_PRIORITIES', '')
+
+# Without aging a level is worth more waiting time than any job will ever accumulate
+_LEVEL_SECONDS = QUEUE_PRIORITY_AGING if QUEUE_PRIORITY_AGING > 0 else 1e10
+
+def _parse_key_priorities(value):
+    """Parse QUEUE_KEY_PRIORITIES, clamping priorities to the valid range and skipping malformed entries."""
+    priorities = {}
+    for entry in filter(None, (e.strip() for e in value.split(','))):
+        api_key, _, priority = entry.rpartition(':')
+        try:
+            priority = int(priority)
+        except ValueError:
+            priority = None
+        if not api_key or priority is None:
+            logger.warning(f"Ignoring malformed QUEUE_KEY_PRIORITIES entry {entry!r}; expected <api key>:<priority>")
+            continue
+        clamped = min(max(priority, QUEUE_MIN_PRIORITY), QUEUE_MAX_PRIORITY)
+        if clamped != priority:
+            logger.warning(f"QUEUE_KEY_PRIORITIES priority {priority} is outside "
+                           f"{QUEUE_MIN_PRIORITY}-{QUEUE_MAX_PRIORITY}; using {clamped}")
+        priorities[api_key] = clamped
+    return priorities
+
+_key_priorities = _parse_key_priorities(QUEUE_KEY_PRIORITIES)
+
+def get_job_priority(data, api_key=None):
+    """Priority of a request: its 'priority' field, else the API key's default, else QUEUE_DEFAULT_PRIORITY."""
+    if data.get('priority') is not None:
+        return data['priority']
+    return _key_priorities.get(api_key, QUEUE_DEFAULT_PRIORITY)
+
+def get_queue_key(priority, enqueued_at):
+    """
+    Sort key of a queued job: its enqueue time moved earlier by one aging period per
+    priority level. Jobs with the lowest key run first, so waiting has the same effect
+    as a higher priority and the order never has to be recomputed.
+    """
+    return enqueued_at - priority * _LEVEL_SECONDS
+
+def get_effective_priority(priority, enqueued_at, now):
+    """Priority of a job after aging for the time it has waited."""
+    if QUEUE_PRIORITY_AGING <= 0:
+        return priority
+    return round(priority + (now - enqueued_at) / QUEUE_PRIORITY_AGING, 2)
+
+class PriorityTaskQueue:
+    """Drop-in for queue.Queue that hands out the job with the lowest queue key first."""
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._not_empty = threading.Condition()
+
+    def put(self, item, priority=QUEUE_DEFAULT_PRIORITY, enqueued_at=0):
+        with self._not_empty:
+            heapq.heappush(self._heap, (get_queue_key(priority, enqueued_at), next(self._counter), item))
+            self._not_empty.notify()
+
+    def get(self):
+        with self._not_empty:
+            while not self._heap:
+                self._not_empty.wait()
+            return heapq.heappop(self._heap)[2]
+
+    def qsize(self):
+        with self._not_empty:
+            return len(self._heap)
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Seconds a finished job stays queryable after its last update
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 3600))
+# Maximum number of job records kept per worker; the oldest finished jobs are dropped first
+JOB_REGISTRY_MAX_JOBS = int(os.environ.get('JOB_REGISTRY_MAX_JOBS', 1000))
+
+ACTIVE_STATES = ('queued', 'running', 'processing')
+
+class JobRegistry:
+    """Thread-safe, bounded record of recent jobs. Finished jobs expire after a TTL."""
+    def __init__(self, max_jobs=JOB_REGISTRY_MAX_JOBS, ttl=JOB_RETENTION_SECONDS, state_key='state'):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.state_key = state_key
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_active(self, record):
+        return record.get(self.state_key) in ACTIVE_STATES
+
+    def _evict(self):
+        """Drop expired finished jobs, then the oldest finished jobs beyond max_jobs. Caller holds _lock."""
+        now = time.time()
+        if self.ttl > 0:
+            expired = [job_id for job_id, record in self._jobs.items()
+                       if not self._is_active(record) and now - record['updated_at'] > self.ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.max_jobs > 0 and len(self._jobs) > self.max_jobs:
+            for job_id in [j for j, r in self._jobs.items() if not self._is_active(r)]:
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                del self._jobs[job_id]
+
+    def set(self, job_id, record):
+        """Create or replace the record for job_id."""
+        with self._lock:
+            now = time.time()
+            existing = self._jobs.pop(job_id, None)
+            self._jobs[job_id] = {**record, 'job_id': job_id,
+                                  'created_at': existing['created_at'] if existing else now,
+                                  'updated_at': now}
+            self._evict()
+
+    def update(self, job_id, **fields):
+        """Update fields of an existing record. Returns False if the job is unknown or evicted."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return False
+            record.update(fields)
+            record['updated_at'] = time.time()
+            return True
+
+    def set_stage(self, job_id, stage):
+        """Record the current processing stage of a job, e.g. 'downloading' or 'encoding'."""
+        return self.update(job_id, stage=stage)
+
+    def _queue_order(self, record):
+        return (record.get('queue_key', record['created_at']), record['created_at'])
+
+    def _queue_position(self, job_id, record):
+        if record.get(self.state_key) != 'queued':
+            return None
+        order = self._queue_order(record)
+        return 1 + sum(1 for other_id, other in self._jobs.items()
+                       if other_id != job_id and other.get(self.state_key) == 'queued'
+                       and other.get('resource_class') == record.get('resource_class')
+                       and self._queue_order(other) < order)
+
+    def get(self, job_id):
+        """Return a copy of the job record, including its current queue position, or None."""
+        with self._lock:
+            self._evict()
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            result = dict(record)
+            if 'resource_class' in record:
+                result['queue_position'] = self._queue_position(job_id, record)
+            return result
+
+    def get_many(self, job_ids):
+        """Return a mapping of job_id to record (or None) for several jobs."""
+        return {job_id: self.get(job_id) for job_id in job_ids}
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def stats(self):
+        """Count of retained jobs per state."""
+        with self._lock:
+            counts = {}
+            for record in self._jobs.values():
+                state = record.get(self.state_key)
+                counts[state] = counts.get(state, 0) + 1
+            return counts
+
+# Registry for jobs created by queue_task in this worker
+job_registry = JobRegistry()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import logging
+import threading
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# Bytes copied per call when writing a stream into the served directory
+STREAM_COPY_CHUNK_SIZE = 1024 * 1024
+
+def get_local_url(base_url, filename):
+    return f"{base_url.rstrip('/')}/{quote(filename)}"
+
+def link_or_copy(source, destination):
+    """
+    Make source available at destination without copying its bytes: a hard link, which
+    leaves the caller free to delete source afterwards. Only falls back to a copy when
+    the two paths are on different filesystems. An existing destination is replaced.
+    """
+    temp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError as e:
+        if isinstance(e, FileNotFoundError):
+            raise
+        logger.warning(f"Cannot hard link {source} into {os.path.dirname(destination)} ({e}); copying it")
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+def publish_file(file_path, directory, base_url, filename=None):
+    """Publish file_path into the served directory and return its URL."""
+    filename = filename or os.path.basename(file_path)
+    os.makedirs(directory, exist_ok=True)
+    link_or_copy(file_path, os.path.join(directory, filename))
+    return get_local_url(base_url, filename)
+
+def publish_stream(stream, directory, base_url, filename):
+    """
+    Write everything read from stream into the served directory and return its URL. The
+    data goes to a hidden temporary file that is renamed into place once the stream ends,
+    so a failing stream never leaves a partial file at the published name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{filename}.{os.getpid()}.{threading.get_ident()}.partial")
+    try:
+        with open(temp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(STREAM_COPY_CHUNK_SIZE), b''):
+                f.write(chunk)
+        os.replace(temp_path, os.path.join(directory, filename))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return get_local_url(base_url, filename)
@@ -0,0 +1,124 @@
+import os
+import struct
+import logging
+import requests
+from services.file_management import download_media
+from services.download_cache import get_download_cache
+from services.downloader import get_session, fetch_concurrently, DOWNLOAD_TIMEOUT
+from services.media_types import detect_container, get_demuxer, CONTAINERS
+
+logger = logging.getLogger(__name__)
+
+# Let ffmpeg read remote inputs directly instead of downloading them first
+FFMPEG_STREAM_INPUTS = os.environ.get('FFMPEG_STREAM_INPUTS', 'true').lower() in ('1', 'true')
+# Bytes fetched to decide whether an input can be streamed
+STREAM_PROBE_BYTES = 64 * 1024
+
+# Input options that let ffmpeg's HTTP client recover from dropped connections
+STREAM_INPUT_OPTIONS = {'reconnect': '1', 'reconnect_streamed': '1', 'reconnect_delay_max': '5'}
+
+MP4_BOX_TYPES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pdin', b'uuid')
+
+class MediaInput:
+    """
+    An ffmpeg input: either a remote URL read directly, or a file staged in local storage.
+    When the container is known from the content, ffmpeg is told the demuxer up front
+    instead of probing for it.
+    """
+    def __init__(self, source, local_path=None, options=None, container=None):
+        self.source = source
+        self.local_path = local_path
+        self.container = container
+        self.options = dict(options or {})
+        if get_demuxer(container):
+            self.options['f'] = get_demuxer(container)
+
+    @property
+    def mime(self):
+        return CONTAINERS[self.container][1] if self.container else None
+
+    @property
+    def streamed(self):
+        return self.source.startswith(('http://', 'https://'))
+
+    def input_args(self):
+        """Arguments for an ffmpeg command line, ending with '-i <source>'."""
+        args = []
+        for name, value in self.options.items():
+            args.extend([f"-{name}", str(value)])
+        return args + ['-i', self.source]
+
+    def cleanup(self):
+        """Remove the staged copy, if any."""
+        if self.local_path and os.path.exists(self.local_path):
+            os.remove(self.local_path)
+
+def mp4_needs_seeking(head):
+    """
+    True if head starts an MP4/MOV whose index (moov) comes after the media data, so a
+    reader has to jump to the end of the file before it can decode anything.
+    """
+    if len(head) < 8 or head[4:8] not in MP4_BOX_TYPES:
+        return False
+    offset = 0
+    while offset + 8 <= len(head):
+        size, box_type = struct.unpack('>I4s', head[offset:offset + 8])
+        if box_type == b'moov':
+            return False
+        if box_type == b'mdat':
+            return True
+        if size == 1 and offset + 16 <= len(head):
+            size = struct.unpack('>Q', head[offset + 8:offset + 16])[0]
+        if size < 8:
+            break
+        offset += size
+    # moov not found in the probed bytes
+    return True
+
+def _probe(url):
+    """Return (accepts_ranges, needs_seeking, container) from the first bytes of url."""
+    response = get_session(url).get(url, headers={'Range': f"bytes=0-{STREAM_PROBE_BYTES - 1}"},
+                                    stream=True, timeout=DOWNLOAD_TIMEOUT)
+    try:
+        response.raise_for_status()
+        head = b''
+        for chunk in response.iter_content(chunk_size=STREAM_PROBE_BYTES):
+            head += chunk
+            if len(head) >= STREAM_PROBE_BYTES:
+                break
+        head = head[:STREAM_PROBE_BYTES]
+        return response.status_code == 206, mp4_needs_seeking(head), detect_container(head)
+    finally:
+        response.close()
+
+def open_media_input(url, storage_path="/tmp/"):
+    """
+    Prepare url as an ffmpeg input. Remote media is streamed straight into ffmpeg so
+    decoding overlaps the transfer; it is downloaded first when it is already in the
+    download cache, or when it needs seeking (moov after mdat) and the server does not
+    support range requests.
+    """
+    if not FFMPEG_STREAM_INPUTS or not url.startswith(('http://', 'https://')):
+        downloaded = download_media(url, storage_path)
+        staged = downloaded.path != url and f"file://{downloaded.path}" != url
+        return MediaInput(downloaded.path, local_path=downloaded.path if staged else None, container=downloaded.container)
+
+    cache = get_download_cache()
+    if cache and cache.lookup(url):
+        downloaded = download_media(url, storage_path)
+        return MediaInput(downloaded.path, local_path=downloaded.path, container=downloaded.container)
+
+    try:
+        accepts_ranges, needs_seeking, container = _probe(url)
+    except requests.RequestException as e:
+        logger.info(f"Could not probe {url} for streaming ({e}); downloading it first")
+        accepts_ranges, needs_seeking, container = False, True, None
+    if needs_seeking and not accepts_ranges:
+        downloaded = download_media(url, storage_path)
+        return MediaInput(downloaded.path, local_path=downloaded.path, container=downloaded.container)
+    return MediaInput(url, options=STREAM_INPUT_OPTIONS, container=container)
+
+def open_media_inputs(urls, storage_path="/tmp/"):
+    """Prepare several inputs of one job concurrently, in the order given."""
+    return fetch_concurrently(lambda url, index: open_media_input(url, storage_path), urls,
+                              lambda media_input: media_input.cleanup())
@@ -0,0 +1,42 @@
+import os
+import logging
+from services.cloud_storage import upload_file, upload_stream
+from services.job_control import open_process_output, run_process
+
+logger = logging.getLogger(__name__)
+
+# Pipe ffmpeg output straight into the storage upload while encoding, instead of uploading the finished file
+FFMPEG_STREAM_UPLOADS = os.environ.get('FFMPEG_STREAM_UPLOADS', 'false').lower() in ('1', 'true')
+
+# Output options that make a container writable to a pipe, by file extension
+STREAMABLE_OUTPUT_FORMATS = {
+    # Fragmented MP4: the index is written per fragment instead of at the end
+    '.mp4': ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    '.mov': ['-f', 'mov', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    '.mkv': ['-f', 'matroska'],
+    '.webm': ['-f', 'webm'],
+    '.ts': ['-f', 'mpegts'],
+    '.mp3': ['-f', 'mp3'],
+}
+
+def can_stream_output(output_path):
+    return FFMPEG_STREAM_UPLOADS and os.path.splitext(output_path)[1].lower() in STREAMABLE_OUTPUT_FORMATS
+
+def encode_and_upload(cmd, output_path):
+    """
+    Run an ffmpeg command line that writes output_path and upload the result, returning
+    its URL. With FFMPEG_STREAM_UPLOADS, streamable outputs are written to a pipe and
+    uploaded part by part while ffmpeg is still encoding, so the URL is ready shortly
+    after encoding ends; the upload is abandoned if ffmpeg fails.
+    """
+    if not can_stream_output(output_path):
+        run_process(cmd, check=True, capture_output=True, text=True)
+        url = upload_file(output_path)
+        os.remove(output_path)
+        return url
+
+    index = cmd.index(output_path)
+    stream_cmd = cmd[:index] + STREAMABLE_OUTPUT_FORMATS[os.path.splitext(output_path)[1].lower()] + ['pipe:1'] + cmd[index + 1:]
+    logger.info(f"Streaming ffmpeg output to storage as {os.path.basename(output_path)}")
+    with open_process_output(stream_cmd) as output:
+        return upload_stream(output, os.path.basename(output_path))
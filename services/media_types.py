@@ -0,0 +1,113 @@
+import os
+import re
+import mimetypes
+from urllib.parse import urlparse, unquote
+
+# Bytes needed from the start of a file to recognise its container
+SNIFF_BYTES = 512
+
+# container: (extension, MIME type, ffmpeg demuxer or None to let ffmpeg pick by extension)
+CONTAINERS = {
+    'mp4': ('.mp4', 'video/mp4', 'mov'),
+    'mov': ('.mov', 'video/quicktime', 'mov'),
+    'm4a': ('.m4a', 'audio/mp4', 'mov'),
+    '3gp': ('.3gp', 'video/3gpp', 'mov'),
+    'webm': ('.webm', 'video/webm', 'matroska'),
+    'mkv': ('.mkv', 'video/x-matroska', 'matroska'),
+    'avi': ('.avi', 'video/x-msvideo', 'avi'),
+    'flv': ('.flv', 'video/x-flv', 'flv'),
+    'mpegts': ('.ts', 'video/mp2t', 'mpegts'),
+    'mpeg': ('.mpg', 'video/mpeg', 'mpeg'),
+    'mp3': ('.mp3', 'audio/mpeg', 'mp3'),
+    'aac': ('.aac', 'audio/aac', 'aac'),
+    'wav': ('.wav', 'audio/wav', 'wav'),
+    'aiff': ('.aiff', 'audio/aiff', 'aiff'),
+    'ogg': ('.ogg', 'audio/ogg', 'ogg'),
+    'flac': ('.flac', 'audio/flac', 'flac'),
+    'png': ('.png', 'image/png', None),
+    'jpeg': ('.jpg', 'image/jpeg', None),
+    'gif': ('.gif', 'image/gif', None),
+    'webp': ('.webp', 'image/webp', None),
+    'bmp': ('.bmp', 'image/bmp', None),
+}
+
+IMAGE_CONTAINERS = ('png', 'jpeg', 'gif', 'webp', 'bmp')
+
+MP4_BRANDS = {b'qt  ': 'mov', b'M4A ': 'm4a', b'M4B ': 'm4a', b'3gp4': '3gp', b'3gp5': '3gp', b'3g2a': '3gp'}
+
+def detect_container(head):
+    """Identify the container of a file from its first bytes, or return None."""
+    if len(head) >= 12 and head[4:8] == b'ftyp':
+        return MP4_BRANDS.get(head[8:12], 'mp4')
+    if len(head) >= 8 and head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        return 'mov'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm' if b'webm' in head[:64] else 'mkv'
+    if head.startswith(b'RIFF') and len(head) >= 12:
+        return {b'WAVE': 'wav', b'AVI ': 'avi', b'WEBP': 'webp'}.get(head[8:12])
+    if head.startswith(b'FORM') and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'aiff'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith(b'BM') and len(head) >= 14 and head[6:10] == b'\0\0\0\0':
+        return 'bmp'
+    if head.startswith(b'OggS'):
+        return 'ogg'
+    if head.startswith(b'fLaC'):
+        return 'flac'
+    if head.startswith(b'FLV\x01'):
+        return 'flv'
+    if head.startswith(b'\x00\x00\x01\xba'):
+        return 'mpeg'
+    if len(head) > 376 and head[0] == head[188] == head[376] == 0x47:
+        return 'mpegts'
+    if head.startswith(b'ID3'):
+        return 'mp3'
+    if len(head) >= 2 and head[0] == 0xff:
+        if head[1] & 0xf6 == 0xf0:
+            return 'aac'  # ADTS
+        if head[1] & 0xe0 == 0xe0:
+            return 'mp3'  # MPEG audio frame sync
+    return None
+
+def get_container_for_mime(mime):
+    mime = (mime or '').split(';')[0].strip().lower()
+    for container, (_, container_mime, _) in CONTAINERS.items():
+        if container_mime == mime:
+            return container
+    return {'audio/mp3': 'mp3', 'audio/x-wav': 'wav', 'audio/wave': 'wav', 'image/jpg': 'jpeg',
+            'audio/x-m4a': 'm4a', 'audio/flac': 'flac', 'audio/x-flac': 'flac'}.get(mime)
+
+def get_filename_extension(headers, url):
+    """Extension of the file name from a Content-Disposition header, or else from the URL path."""
+    disposition = (headers or {}).get('Content-Disposition', '')
+    match = re.search(r"filename\*=(?:UTF-8'')?([^;]+)|filename=\"?([^\";]+)", disposition, re.IGNORECASE)
+    name = unquote(match.group(1) or match.group(2)) if match else unquote(urlparse(url).path)
+    extension = os.path.splitext(name.strip())[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,5}', extension) else ''
+
+def identify(head, headers=None, url=''):
+    """
+    Return (extension, mime, container) for a file. Magic bytes decide when they are
+    recognised; otherwise the Content-Type, then the file name from Content-Disposition
+    or the URL are used. container is None unless the content itself was recognised.
+    """
+    container = detect_container(head)
+    if container:
+        extension, mime, _ = CONTAINERS[container]
+        return extension, mime, container
+    content_type = (headers or {}).get('Content-Type', '').split(';')[0].strip().lower()
+    header_container = get_container_for_mime(content_type)
+    if header_container:
+        extension, mime, _ = CONTAINERS[header_container]
+        return extension, mime, None
+    extension = get_filename_extension(headers, url)
+    mime = mimetypes.types_map.get(extension) or content_type or 'application/octet-stream'
+    return extension, mime, None
+
+def get_demuxer(container):
+    return CONTAINERS[container][2] if container in CONTAINERS else None
@@ -0,0 +1,226 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from concurrent.futures.process import BrokenProcessPool
+from services.whisper_models import acquire_model
+from services.job_control import run_process, check_cancelled, get_current_job_id
+from services.job_registry import job_registry
+from services.transcript_cache import get_transcript_cache, hash_file, TranscriptCache
+from services.voice_activity import TRANSCRIBE_VAD, remove_silence
+
+logger = logging.getLogger(__name__)
+
+# Media at least this long (seconds) is split at silences and transcribed on several cores; 0 disables
+TRANSCRIBE_PARALLEL_MIN_SECONDS = float(os.environ.get('TRANSCRIBE_PARALLEL_MIN_SECONDS', 0))
+# Processes transcribing chunks; each loads its own copy of the model once
+TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', min(4, os.cpu_count() or 1)))
+# Torch threads per process, so that the pool does not oversubscribe the CPU
+TRANSCRIBE_THREADS_PER_WORKER = int(os.environ.get('TRANSCRIBE_THREADS_PER_WORKER', max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_WORKERS))))
+# Target chunk length, and how far from it (seconds) to look for the quietest point to cut at
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 300))
+TRANSCRIBE_SILENCE_SEARCH_SECONDS = float(os.environ.get('TRANSCRIBE_SILENCE_SEARCH_SECONDS', 30))
+
+# Whisper works on 16 kHz mono audio; segment 'seek' values count 10 ms mel frames
+SAMPLE_RATE = 16000
+FRAMES_PER_SECOND = 100
+# Resolution of the silence search
+ENERGY_FRAME = SAMPLE_RATE // 10
+# Audio used to detect the language once for all chunks
+LANGUAGE_DETECTION_SECONDS = 30
+
+# One pool per model size, so that a job using another model never disturbs chunks in flight
+_pools = {}
+_pool_lock = threading.Lock()
+
+# State of each pool process
+_worker_model = None
+
+def _init_worker(model_size, threads):
+    global _worker_model
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_size)
+
+def _transcribe_chunk(audio, options):
+    return _worker_model.transcribe(audio, **options)
+
+def _detect_language(audio):
+    import whisper
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), _worker_model.dims.n_mels).to(_worker_model.device)
+    _, probs = _worker_model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+def _get_pool(model_size):
+    """Return the process pool for model_size, starting it (and loading the models) on first use."""
+    with _pool_lock:
+        pool = _pools.get(model_size)
+        if pool is None:
+            logger.info(f"Starting {TRANSCRIBE_WORKERS} transcription processes for the Whisper {model_size} model "
+                        f"({TRANSCRIBE_THREADS_PER_WORKER} threads each)")
+            # Spawned rather than forked: the parent runs threads and may already hold torch state
+            pool = ProcessPoolExecutor(max_workers=TRANSCRIBE_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker, initargs=(model_size, TRANSCRIBE_THREADS_PER_WORKER))
+            _pools[model_size] = pool
+        return pool
+
+def _reset_pool(model_size, pool):
+    """Discard a broken pool; the next job for model_size starts a new one."""
+    with _pool_lock:
+        if _pools.get(model_size) is pool:
+            del _pools[model_size]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def load_audio(input_filename):
+    """Decode input_filename to 16 kHz mono float32 samples, as whisper.load_audio does, in a cancellable ffmpeg."""
+    import numpy as np
+    cmd = ['ffmpeg', '-nostdin', '-threads', '0', '-i', input_filename,
+           '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-']
+    result = run_process(cmd, check=True, capture_output=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+def find_chunk_boundaries(audio, chunk_seconds=TRANSCRIBE_CHUNK_SECONDS, search_seconds=TRANSCRIBE_SILENCE_SEARCH_SECONDS):
+    """
+    Return the sample offsets at which to cut audio, including 0 and its length. Each cut
+    is made at the quietest 100 ms frame within search_seconds of the target chunk length,
+    so chunks rarely split a word.
+    """
+    import numpy as np
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    search = min(int(search_seconds * SAMPLE_RATE), chunk // 2)
+    boundaries = [0]
+    while len(audio) - boundaries[-1] > chunk + search:
+        low = boundaries[-1] + chunk - search
+        frames = (2 * search) // ENERGY_FRAME
+        if frames == 0:
+            boundaries.append(boundaries[-1] + chunk)
+            continue
+        window = audio[low:low + frames * ENERGY_FRAME].reshape(frames, ENERGY_FRAME)
+        energy = np.square(window).mean(axis=1)
+        boundaries.append(low + int(np.argmin(energy)) * ENERGY_FRAME + ENERGY_FRAME // 2)
+    boundaries.append(len(audio))
+    return boundaries
+
+def merge_chunk_results(results, boundaries, language=None):
+    """
+    Stitch per-chunk Whisper results into one, shifting segment and word timestamps by the
+    chunk's offset and renumbering segments so ids (and SRT numbering) run across chunks.
+    """
+    segments = []
+    for result, start, end in zip(results, boundaries, boundaries[1:]):
+        offset = start / SAMPLE_RATE
+        chunk_end = end / SAMPLE_RATE
+        for segment in result['segments']:
+            segment = dict(segment)
+            segment['id'] = len(segments)
+            segment['seek'] = segment.get('seek', 0) + round(offset * FRAMES_PER_SECOND)
+            segment['start'] = round(min(segment['start'] + offset, chunk_end), 3)
+            segment['end'] = round(min(segment['end'] + offset, chunk_end), 3)
+            if 'words' in segment:
+                segment['words'] = [{**word, 'start': round(min(word['start'] + offset, chunk_end), 3),
+                                     'end': round(min(word['end'] + offset, chunk_end), 3)}
+                                    for word in segment['words']]
+            segments.append(segment)
+    return {
+        'text': ''.join(result['text'] for result in results),
+        'segments': segments,
+        'language': language or (results[0].get('language') if results else None)
+    }
+
+def transcribe_chunked(audio, model_size, **options):
+    """Transcribe audio (16 kHz samples) in silence-aligned chunks on the process pool."""
+    boundaries = find_chunk_boundaries(audio)
+    pool = _get_pool(model_size)
+    options = {**options, 'verbose': None}
+    job_id = get_current_job_id()
+    start_time = time.time()
+    futures = []
+    try:
+        if not options.get('language'):
+            # Detect once so that every chunk is decoded from the same source language
+            options['language'] = pool.submit(_detect_language, audio[:LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE]).result()
+            logger.info(f"Detected language: {options['language']}")
+        futures = [pool.submit(_transcribe_chunk, audio[start:end], options)
+                   for start, end in zip(boundaries, boundaries[1:])]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=1, return_when=FIRST_EXCEPTION)
+            for future in done:
+                future.result()
+            check_cancelled()
+            job_registry.update(job_id, progress={"chunks_done": len(futures) - len(pending), "chunks": len(futures)})
+    except BrokenProcessPool:
+        _reset_pool(model_size, pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+    duration = len(audio) / SAMPLE_RATE
+    elapsed = max(time.time() - start_time, 1e-3)
+    logger.info(f"Transcribed {duration:.0f}s of audio in {len(futures)} chunks on {TRANSCRIBE_WORKERS} processes "
+                f"in {elapsed:.1f}s ({duration / elapsed:.1f}x real time)")
+    return merge_chunk_results([future.result() for future in futures], boundaries, options.get('language'))
+
+def transcribe_audio(audio, model_size, **options):
+    if TRANSCRIBE_PARALLEL_MIN_SECONDS > 0 and len(audio) >= TRANSCRIBE_PARALLEL_MIN_SECONDS * SAMPLE_RATE:
+        return transcribe_chunked(audio, model_size, **options)
+    with acquire_model(model_size) as model:
+        return model.transcribe(audio, **options)
+
+def transcribe_uncached(input_filename, model_size="base", **options):
+    """
+    Transcribe a media file with Whisper and return its result dict. Media longer than
+    TRANSCRIBE_PARALLEL_MIN_SECONDS is split at silences and transcribed in parallel;
+    anything shorter (or every file, when it is 0) uses the worker's shared model. With
+    TRANSCRIBE_VAD, regions without speech are cut out first and the timestamps mapped back.
+    """
+    if TRANSCRIBE_PARALLEL_MIN_SECONDS <= 0 and not TRANSCRIBE_VAD:
+        with acquire_model(model_size) as model:
+            return model.transcribe(input_filename, **options)
+
+    audio = load_audio(input_filename)
+    if not TRANSCRIBE_VAD:
+        return transcribe_audio(audio, model_size, **options)
+
+    speech, time_map, report = remove_silence(audio)
+    job_registry.update(get_current_job_id(), vad=report)
+    if len(speech) == 0:
+        return {'text': '', 'segments': [], 'language': options.get('language'), 'vad': report}
+    result = time_map.apply(transcribe_audio(speech, model_size, **options))
+    result['vad'] = report
+    return result
+
+def transcribe_file(input_filename, model_size="base", **options):
+    """
+    Transcribe a media file, reusing the result of an earlier transcription of the same
+    content with the same model, language, task and word_timestamps from the transcript cache.
+    """
+    cache = get_transcript_cache()
+    if cache is None:
+        return transcribe_uncached(input_filename, model_size, **options)
+
+    media_sha256 = hash_file(input_filename)
+    # Results with silence removed can differ, so they are cached apart
+    cache_fields = (media_sha256, f"{model_size}+vad" if TRANSCRIBE_VAD else model_size, options.get('language') or None,
+                    options.get('task', 'transcribe'), bool(options.get('word_timestamps', False)))
+    key = TranscriptCache.get_key(*cache_fields)
+    try:
+        result = cache.get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"Transcript cache lookup failed: {e}")
+        result = None
+    if result is not None:
+        logger.info(f"Reusing cached transcript for {input_filename} ({key})")
+        return result
+
+    result = transcribe_uncached(input_filename, model_size, **options)
+    try:
+        cache.put(key, *cache_fields, result)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.warning(f"Could not cache transcript for {input_filename}: {e}")
+    return result
@@ -0,0 +1,73 @@
+import os
+import json
+import random
+import logging
+
+# How job, webhook and settings payloads appear in the logs: 'summary' (allow-listed fields,
+# size-bounded), 'full' (every field, size-bounded) or 'off' (the message without the payload)
+LOG_PAYLOADS = os.environ.get('LOG_PAYLOADS', 'summary').lower()
+# Top-level fields of job and webhook payloads kept in 'summary' mode
+LOG_PAYLOAD_FIELDS = [field.strip() for field in os.environ.get(
+    'LOG_PAYLOAD_FIELDS',
+    'id,job_id,endpoint,code,message,resource_class,priority,run_time,queue_time,total_time,deduplicated,'
+    'video_url,media_url,image_url,audio_url,output,output_type,task,language'
+).split(',') if field.strip()]
+# Maximum length of a logged payload, and of the items shown from each list
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get('LOG_PAYLOAD_MAX_CHARS', 2000))
+LOG_PAYLOAD_MAX_ITEMS = int(os.environ.get('LOG_PAYLOAD_MAX_ITEMS', 10))
+# Fraction of INFO-level payloads that are logged; the others log the message alone
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 1.0))
+
+# Limits applied while walking a payload, so a huge one (e.g. a segment list) is never serialized whole
+MAX_STRING_CHARS = 200
+MAX_DICT_FIELDS = 50
+MAX_DEPTH = 3
+
+def _shrink(value, depth=0):
+    if isinstance(value, str):
+        return value if len(value) <= MAX_STRING_CHARS else f"{value[:MAX_STRING_CHARS]}... ({len(value)} chars)"
+    if isinstance(value, dict):
+        if depth >= MAX_DEPTH:
+            return f"{{{len(value)} fields}}"
+        items = list(value.items())
+        shrunk = {str(key): _shrink(item, depth + 1) for key, item in items[:MAX_DICT_FIELDS]}
+        if len(items) > MAX_DICT_FIELDS:
+            shrunk['...'] = f"{len(items) - MAX_DICT_FIELDS} more fields"
+        return shrunk
+    if isinstance(value, (list, tuple)):
+        if depth >= MAX_DEPTH:
+            return f"[{len(value)} items]"
+        shrunk = [_shrink(item, depth + 1) for item in value[:LOG_PAYLOAD_MAX_ITEMS]]
+        if len(value) > LOG_PAYLOAD_MAX_ITEMS:
+            shrunk.append(f"... {len(value) - LOG_PAYLOAD_MAX_ITEMS} more items")
+        return shrunk
+    return value
+
+def describe_payload(payload, fields=LOG_PAYLOAD_FIELDS):
+    """
+    Size-bounded JSON rendering of payload for the logs. In 'summary' mode a dict keeps only
+    the allow-listed fields (pass fields=None to keep all of them); long strings and lists
+    are cut before serialization and the result is capped at LOG_PAYLOAD_MAX_CHARS.
+    """
+    if isinstance(payload, dict) and fields and LOG_PAYLOADS != 'full':
+        omitted = sum(1 for key in payload if key not in fields)
+        payload = {key: value for key, value in payload.items() if key in fields}
+        if omitted:
+            payload['...'] = f"{omitted} fields not logged"
+    text = json.dumps(_shrink(payload), default=str, ensure_ascii=False)
+    if len(text) > LOG_PAYLOAD_MAX_CHARS:
+        text = f"{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+    return text
+
+def log_payload(logger, level, message, payload, fields=LOG_PAYLOAD_FIELDS):
+    """
+    Log message followed by a bounded rendering of payload. Nothing is rendered when the
+    level is disabled, and INFO-level payloads are sampled with LOG_PAYLOAD_SAMPLE_RATE;
+    warnings and errors always carry theirs.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_PAYLOADS == 'off' or (level < logging.WARNING and random.random() >= LOG_PAYLOAD_SAMPLE_RATE):
+        logger.log(level, message)
+        return
+    logger.log(level, f"{message}: {describe_payload(payload, fields)}")
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from services.job_priority import QUEUE_DEFAULT_PRIORITY, get_queue_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds between worker heartbeats, and after which a silent worker's jobs are recovered
+QUEUE_HEARTBEAT_INTERVAL = int(os.environ.get('QUEUE_HEARTBEAT_INTERVAL', 10))
+QUEUE_HEARTBEAT_TIMEOUT = int(os.environ.get('QUEUE_HEARTBEAT_TIMEOUT', 60))
+
+ACTIVE_STATES = ('queued', 'running')
+
+class PersistentQueue:
+    """
+    SQLite journal of accepted jobs shared by every worker on the host.
+    A row is written when a job is queued and kept, with its result, until purged after
+    it has finished. Active rows owned by a worker that stopped heartbeating are handed
+    back through recover(), and claim() lets any worker pull the next job of a class.
+    """
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'queue.db')
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    resource_class TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    endpoint TEXT,
+                    data TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    dedup_key TEXT,
+                    priority INTEGER NOT NULL DEFAULT 5,
+                    queue_key REAL NOT NULL,
+                    deadline_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, resource_class, enqueued_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue_key ON jobs (state, resource_class, queue_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup_key ON jobs (dedup_key, enqueued_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscribers (
+                    job_id TEXT NOT NULL,
+                    subscriber TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS subscribers_job_id ON subscribers (job_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    owner TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+        self.heartbeat()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def heartbeat(self):
+        self._execute("INSERT OR REPLACE INTO workers (owner, pid, heartbeat_at) VALUES (?, ?, ?)",
+                      (self.owner, os.getpid(), time.time()))
+
+    def put(self, job_id, resource_class, task, endpoint, data, enqueued_at, dedup_key=None, priority=QUEUE_DEFAULT_PRIORITY,
+            deadline_at=None):
+        self._execute(
+            "INSERT INTO jobs (job_id, resource_class, task, endpoint, data, state, owner, enqueued_at, dedup_key, priority, "
+            "queue_key, deadline_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, resource_class, task, endpoint, json.dumps(data), self.owner, enqueued_at, dedup_key,
+             priority, get_queue_key(priority, enqueued_at), deadline_at))
+
+    def mark_running(self, job_id):
+        """Mark a queued job as started. Returns False if it is no longer queued (e.g. cancelled)."""
+        return self._execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = ? "
+                             "WHERE job_id = ? AND state = 'queued'", (time.time(), job_id)) > 0
+
+    def finish(self, job_id, state, result):
+        self._execute("UPDATE jobs SET state = ?, finished_at = ?, result = ? WHERE job_id = ?",
+                      (state, time.time(), json.dumps(result), job_id))
+
+    def claim(self, resource_class):
+        """Atomically take the next queued job of a class (highest aged priority first) for this worker, or return None."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' AND resource_class = ? ORDER BY queue_key, enqueued_at LIMIT 1",
+                (resource_class,)).fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET state = 'running', owner = ?, attempts = attempts + 1, started_at = ? "
+                             "WHERE job_id = ?", (self.owner, time.time(), row['job_id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        row = dict(row)
+        row['data'] = json.loads(row['data'])
+        return row
+
+    def request_cancel(self, job_id):
+        """
+        Cancel a queued job outright, or flag a running job for its owner to kill.
+        Returns the job row as it was before the request, or None if the job is unknown.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row and row['state'] == 'queued':
+                conn.execute("UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE job_id = ?", (time.time(), job_id))
+            elif row and row['state'] == 'running':
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        row = dict(row)
+        row['data'] = json.loads(row['data'])
+        return row
+
+    def cancel_requests(self):
+        """Ids of jobs running in this worker that another worker asked to cancel."""
+        conn = self._connect()
+        try:
+            return [row['job_id'] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE owner = ? AND state = 'running' AND cancel_requested = 1", (self.owner,))]
+        finally:
+            conn.close()
+
+    def find_job_id(self, dedup_key):
+        """Id of the newest active or completed job submitted with dedup_key, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE dedup_key = ? AND state IN ('queued', 'running', 'completed') "
+                "ORDER BY enqueued_at DESC LIMIT 1", (dedup_key,)).fetchone()
+            return row['job_id'] if row else None
+        finally:
+            conn.close()
+
+    def add_subscriber(self, job_id, subscriber):
+        """Attach a duplicate request to a job so whichever worker finishes it notifies the subscriber too."""
+        self._execute("INSERT INTO subscribers (job_id, subscriber) VALUES (?, ?)", (job_id, json.dumps(subscriber)))
+
+    def pop_subscribers(self, job_id):
+        """Remove and return the subscribers attached to a job."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT subscriber FROM subscribers WHERE job_id = ?", (job_id,)).fetchall()
+            conn.execute("DELETE FROM subscribers WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [json.loads(row['subscriber']) for row in rows]
+
+    def count_queued(self, resource_class=None):
+        """Number of jobs waiting host-wide, optionally for a single resource class."""
+        conn = self._connect()
+        try:
+            if resource_class:
+                return conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND resource_class = ?",
+                                    (resource_class,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        """Return the stored state of a job, including its host-wide queue position, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            queue_position = None
+            if row['state'] == 'queued':
+                queue_position = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND resource_class = ? AND queue_key < ?",
+                    (row['resource_class'], row['queue_key'])).fetchone()[0] + 1
+        finally:
+            conn.close()
+        job = {
+            "job_id": row['job_id'],
+            "id": json.loads(row['data']).get('id'),
+            "endpoint": row['endpoint'],
+            "resource_class": row['resource_class'],
+            "state": row['state'],
+            "stage": 'finished' if row['state'] not in ACTIVE_STATES else row['state'],
+            "queue_position": queue_position,
+            "priority": row['priority'],
+            "queued_at": row['enqueued_at'],
+            "started_at": row['started_at'],
+            "finished_at": row['finished_at'],
+            "attempts": row['attempts'],
+            "worker": row['owner']
+        }
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        return job
+
+    def purge(self, retention):
+        """Delete finished jobs older than retention seconds."""
+        purged = self._execute("DELETE FROM jobs WHERE state NOT IN ('queued', 'running') AND finished_at < ?",
+                               (time.time() - retention,))
+        if purged:
+            self._execute("DELETE FROM subscribers WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+        return purged
+
+    def recover(self):
+        """
+        Take ownership of jobs left behind by workers whose heartbeat expired and mark them queued again.
+        Returns the claimed rows as dicts; 'attempts' > 0 means the job had already started.
+        """
+        cutoff = time.time() - QUEUE_HEARTBEAT_TIMEOUT
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            dead_owners = [row['owner'] for row in conn.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE state IN ('queued', 'running') AND owner != ? AND owner NOT IN "
+                "(SELECT owner FROM workers WHERE heartbeat_at >= ?)", (self.owner, cutoff))]
+            rows = []
+            for owner in dead_owners:
+                rows.extend(dict(row) for row in conn.execute(
+                    "SELECT * FROM jobs WHERE owner = ? AND state IN ('queued', 'running')", (owner,)))
+                conn.execute("UPDATE jobs SET owner = ?, state = 'queued' WHERE owner = ? AND state IN ('queued', 'running')",
+                             (self.owner, owner))
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        for row in rows:
+            row['data'] = json.loads(row['data'])
+        if rows:
+            logger.warning(f"Recovered {len(rows)} job(s) from {len(dead_owners)} stopped worker(s)")
+        return rows
+
+    def start_heartbeat(self, on_recover, retention):
+        """Heartbeat in the background, pass jobs orphaned by other workers to on_recover and purge old results."""
+        def run():
+            while True:
+                time.sleep(QUEUE_HEARTBEAT_INTERVAL)
+                try:
+                    self.heartbeat()
+                    rows = self.recover()
+                    if rows:
+                        on_recover(rows)
+                    self.purge(retention)
+                except Exception as e:
+                    logger.error(f"Persistent queue heartbeat failed: {e}")
+        threading.Thread(target=run, daemon=True).start()
@@ -1,13 +1,45 @@
 import os
+import base64
 import boto3
+import hashlib
 import logging
+import threading
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from config import STORAGE_MAX_POOL_CONNECTIONS
+from services.job_control import get_current_job_id, bind_job, check_cancelled
 
 logger = logging.getLogger(__name__)
 
+# Files at least this large are sent as a multipart upload
+S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', 64 * 1024 * 1024))
+# Size of each part (raised automatically if a file would need more than 10,000 parts)
+S3_UPLOAD_PART_SIZE = int(os.environ.get('S3_UPLOAD_PART_SIZE', 32 * 1024 * 1024))
+# Parts of one file uploaded at the same time
+S3_UPLOAD_CONCURRENCY = int(os.environ.get('S3_UPLOAD_CONCURRENCY', 8))
+
+# Limits of the S3 multipart API
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+_clients = {}
+_clients_lock = threading.Lock()
+
 def parse_s3_url(s3_url):
-    """Parse S3 URL to extract bucket name, region, and endpoint URL."""
+    """
+    Parse S3 URL to extract bucket name, region, and endpoint URL.
+    DigitalOcean Spaces URLs name the bucket and region in the host
+    (https://bucket.region.digitaloceanspaces.com); any other endpoint is addressed
+    path-style, with the bucket as the first path segment (http://host:9000/bucket).
+    """
     parsed_url = urlparse(s3_url)
+
+    if not parsed_url.hostname.endswith('digitaloceanspaces.com'):
+        bucket_name = parsed_url.path.strip('/').split('/')[0]
+        region = os.environ.get('S3_REGION', 'us-east-1')
+        return bucket_name, region, f"{parsed_url.scheme}://{parsed_url.netloc}"
     
     # Extract bucket name from the host
     bucket_name = parsed_url.hostname.split('.')[0]
@@ -20,24 +52,182 @@ def parse_s3_url(s3_url):
     
     return bucket_name, region, endpoint_url
 
-def upload_to_s3(file_path, s3_url, access_key, secret_key):
+def get_s3_client(endpoint_url, access_key, secret_key, region):
+    """
+    Return the shared client for these credentials, creating it on first use. boto3
+    clients are thread-safe, so one client and its connection pool serve every upload.
+    """
+    key = (endpoint_url, access_key, secret_key, region)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region
+            )
+            client = session.client('s3', endpoint_url=endpoint_url,
+                                    config=Config(max_pool_connections=STORAGE_MAX_POOL_CONNECTIONS))
+            _clients[key] = client
+        return client
+
+def get_content_md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+def get_file_content_md5(file_path, chunk_size=1024 * 1024):
+    """Content-MD5 of a file, computed in chunks so the file is never held in memory."""
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('ascii')
+
+def get_part_size(size, part_size=S3_UPLOAD_PART_SIZE):
+    return max(part_size, MIN_PART_SIZE, -(-size // MAX_PARTS))
+
+def upload_part(client, bucket_name, key, upload_id, part_number, data):
+    """Upload one part with its MD5, which the server checks before accepting it."""
+    check_cancelled()
+    response = client.upload_part(Bucket=bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                  Body=data, ContentMD5=get_content_md5(data))
+    return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+def abort_multipart_upload(client, bucket_name, key, upload_id):
+    try:
+        client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+    except Exception as e:
+        logger.warning(f"Could not abort multipart upload {upload_id} of {key}: {e}")
+
+def upload_multipart(client, file_path, bucket_name, key, extra_args):
+    """
+    Upload file_path in parts of S3_UPLOAD_PART_SIZE, S3_UPLOAD_CONCURRENCY at a time.
+    Each worker reads its own part with pread, so at most one part per worker is in memory.
+    The upload is aborted if any part fails.
+    """
+    size = os.path.getsize(file_path)
+    part_size = get_part_size(size)
+    part_count = -(-size // part_size)
+    job_id = get_current_job_id()
+    upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=key, **extra_args)['UploadId']
+    logger.info(f"Uploading {file_path} ({size} bytes) in {part_count} parts of {part_size} bytes")
+
+    fd = os.open(file_path, os.O_RDONLY)
+
+    def send(part_number):
+        with bind_job(job_id):
+            data = os.pread(fd, part_size, (part_number - 1) * part_size)
+            return upload_part(client, bucket_name, key, upload_id, part_number, data)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(S3_UPLOAD_CONCURRENCY, part_count))) as pool:
+            futures = [pool.submit(send, part_number) for part_number in range(1, part_count + 1)]
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            errors = [future.exception() for future in done if future.exception()]
+            if errors:
+                raise errors[0]
+            parts = [future.result() for future in futures]
+        client.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                         MultipartUpload={'Parts': parts})
+    except BaseException:
+        abort_multipart_upload(client, bucket_name, key, upload_id)
+        raise
+    finally:
+        os.close(fd)
+
+def upload_stream_multipart(client, stream, bucket_name, key, extra_args):
+    """
+    Upload a stream of unknown length as it is produced: every S3_UPLOAD_PART_SIZE bytes
+    read become a part, sent while the next one is read. At most S3_UPLOAD_CONCURRENCY
+    parts are held in memory. Output that fits in one part is sent with put_object.
+    Returns the number of bytes uploaded.
+    """
+    part_size = max(S3_UPLOAD_PART_SIZE, MIN_PART_SIZE)
+    data = stream.read(part_size)
+    if len(data) < part_size:
+        client.put_object(Bucket=bucket_name, Key=key, Body=data, ContentMD5=get_content_md5(data), **extra_args)
+        return len(data)
+
+    job_id = get_current_job_id()
+    upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=key, **extra_args)['UploadId']
+    slots = threading.BoundedSemaphore(S3_UPLOAD_CONCURRENCY)
+
+    def send(part_number, data):
+        try:
+            with bind_job(job_id):
+                return upload_part(client, bucket_name, key, upload_id, part_number, data)
+        finally:
+            slots.release()
+
+    size = 0
+    try:
+        with ThreadPoolExecutor(max_workers=S3_UPLOAD_CONCURRENCY) as pool:
+            futures = []
+            while data:
+                failed = next((future for future in futures if future.done() and future.exception()), None)
+                if failed:
+                    raise failed.exception()
+                slots.acquire()
+                futures.append(pool.submit(send, len(futures) + 1, data))
+                size += len(data)
+                data = stream.read(part_size)
+            parts = [future.result() for future in futures]
+        client.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                         MultipartUpload={'Parts': parts})
+    except BaseException:
+        abort_multipart_upload(client, bucket_name, key, upload_id)
+        raise
+    logger.info(f"Streamed {size} bytes to {key} in {len(parts)} parts")
+    return size
+
+def upload_stream_to_s3(stream, key, s3_url, access_key, secret_key):
+    """Upload everything read from stream as key and return its URL."""
+    bucket_name, region, endpoint_url = parse_s3_url(s3_url)
+    client = get_s3_client(endpoint_url, access_key, secret_key, region)
+    try:
+        upload_stream_multipart(client, stream, bucket_name, key, {'ACL': 'public-read'})
+        return f"{endpoint_url}/{bucket_name}/{key}"
+    except Exception as e:
+        logger.error(f"Error streaming upload to S3: {e}")
+        raise
+
+def get_s3_object_url(key, s3_url):
+    bucket_name, region, endpoint_url = parse_s3_url(s3_url)
+    return f"{endpoint_url}/{bucket_name}/{key}"
+
+def s3_object_exists(key, s3_url, access_key, secret_key):
+    """Check for an object with a HEAD request; nothing is downloaded."""
+    bucket_name, region, endpoint_url = parse_s3_url(s3_url)
+    client = get_s3_client(endpoint_url, access_key, secret_key, region)
+    try:
+        client.head_object(Bucket=bucket_name, Key=key)
+        return True
+    except ClientError as e:
+        # Without s3:ListBucket a missing object is reported as 403 rather than 404
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound', '403'):
+            return False
+        raise
+
+def upload_to_s3(file_path, s3_url, access_key, secret_key, key=None):
     # Parse the S3 URL into bucket, region, and endpoint
     bucket_name, region, endpoint_url = parse_s3_url(s3_url)
     
-    session = boto3.Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region
-    )
-    
-    client = session.client('s3', endpoint_url=endpoint_url)
+    client = get_s3_client(endpoint_url, access_key, secret_key, region)
+    key = key or os.path.basename(file_path)
+    extra_args = {'ACL': 'public-read'}
 
     try:
         # Upload the file to the specified S3 bucket
-        with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'})
+        if os.path.getsize(file_path) >= S3_MULTIPART_THRESHOLD:
+            upload_multipart(client, file_path, bucket_name, key, extra_args)
+        else:
+            # The body is streamed from the file; only its MD5 is computed up front
+            content_md5 = get_file_content_md5(file_path)
+            with open(file_path, 'rb') as f:
+                client.put_object(Bucket=bucket_name, Key=key, Body=f, ContentMD5=content_md5, **extra_args)
 
-        file_url = f"{endpoint_url}/{bucket_name}/{os.path.basename(file_path)}"
+        file_url = f"{endpoint_url}/{bucket_name}/{key}"
         return file_url
     except Exception as e:
         logger.error(f"Error uploading file to S3: {e}")
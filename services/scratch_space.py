@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from services.job_control import get_current_job_id, get_cancel_reason, JobCancelled
+
+logger = logging.getLogger(__name__)
+
+# Parent of the per-job scratch directories; shared by all workers on the host
+SCRATCH_ROOT = os.environ.get('SCRATCH_ROOT', '/tmp/nca_scratch')
+# Total size the scratch directories may reach (0 = no quota, only SCRATCH_MIN_FREE_BYTES applies)
+SCRATCH_QUOTA_BYTES = int(os.environ.get('SCRATCH_QUOTA_BYTES', 0))
+# Free disk space that must remain after admitting a job
+SCRATCH_MIN_FREE_BYTES = int(os.environ.get('SCRATCH_MIN_FREE_BYTES', 1024 ** 3))
+# Space set aside for each running job when deciding whether another one fits
+SCRATCH_JOB_RESERVE_BYTES = int(os.environ.get('SCRATCH_JOB_RESERVE_BYTES', 512 * 1024 ** 2))
+# Seconds a job waits for space before it is rejected (0 rejects immediately)
+SCRATCH_ADMISSION_TIMEOUT = int(os.environ.get('SCRATCH_ADMISSION_TIMEOUT', 300))
+# Seconds between janitor runs, and age after which any job directory is considered abandoned
+SCRATCH_JANITOR_INTERVAL = int(os.environ.get('SCRATCH_JANITOR_INTERVAL', 300))
+SCRATCH_MAX_AGE = int(os.environ.get('SCRATCH_MAX_AGE', 24 * 3600))
+
+OWNER_FILE = '.owner'
+# Held while a worker checks for room and records its reservation, so workers admit jobs one at a time
+ADMISSION_LOCK_FILE = '.admission.lock'
+# Seconds a scan of the scratch usage is reused by admission checks
+USAGE_SCAN_INTERVAL = 5
+
+class ScratchSpaceUnavailable(Exception):
+    """Raised when a job cannot be given scratch space within SCRATCH_ADMISSION_TIMEOUT."""
+
+_dirs = {}
+_lock = threading.Condition()
+_usage = {"dirs": {}, "scanned_at": 0}
+_usage_lock = threading.Lock()
+_stats = {"admitted": 0, "waited": 0, "rejected": 0, "reclaimed": 0}
+_janitor_started = False
+
+def get_scratch_dir():
+    """Scratch directory of the job running on this thread, or /tmp/ outside of a job."""
+    return _dirs.get(get_current_job_id(), "/tmp/")
+
+def get_dir_size(path):
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += get_dir_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+def _scan_usage():
+    """Bytes used by each job directory under SCRATCH_ROOT, by directory name."""
+    usage = {}
+    for entry in os.scandir(SCRATCH_ROOT):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                usage[entry.name] = get_dir_size(entry.path)
+        except FileNotFoundError:
+            pass
+    return usage
+
+def _get_usage():
+    """
+    _scan_usage(), rescanned at most every USAGE_SCAN_INTERVAL seconds. Threads arriving
+    during a scan wait for its result instead of walking the tree again.
+    """
+    with _usage_lock:
+        if time.time() - _usage["scanned_at"] > USAGE_SCAN_INTERVAL:
+            _usage["dirs"] = _scan_usage()
+            _usage["scanned_at"] = time.time()
+        return _usage["dirs"]
+
+def _invalidate_usage():
+    with _usage_lock:
+        _usage["scanned_at"] = 0
+
+def _read_owner(path):
+    with open(os.path.join(path, OWNER_FILE)) as f:
+        return json.load(f)
+
+def get_reserved_bytes(usage):
+    """
+    Reserved space the jobs of every worker on the host have not written yet: each owner
+    file's reservation less what usage (a _scan_usage() result) shows its directory holds.
+    Bytes already written count as used disk, so they are not counted again here.
+    """
+    reserved = 0
+    for entry in os.scandir(SCRATCH_ROOT):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            reserved += max(0, _read_owner(entry.path).get('reserve', 0) - usage.get(entry.name, 0))
+        except (OSError, ValueError):
+            pass
+    return reserved
+
+@contextmanager
+def _admission_lock():
+    with open(os.path.join(SCRATCH_ROOT, ADMISSION_LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _has_room(usage_bytes, reserved, reserve):
+    """Whether reserve more bytes fit under the quota and above the free space floor."""
+    if shutil.disk_usage(SCRATCH_ROOT).free - reserved - reserve < SCRATCH_MIN_FREE_BYTES:
+        return False
+    if SCRATCH_QUOTA_BYTES > 0 and usage_bytes + reserved + reserve > SCRATCH_QUOTA_BYTES:
+        return False
+    return True
+
+def _try_admit(path, reserve):
+    """Create the job directory with its reservation if there is room. Returns False otherwise."""
+    # The tree is scanned before taking the host-wide lock; directories created since count as
+    # empty, so their whole reservation is held back
+    usage = _get_usage()
+    with _admission_lock():
+        if not _has_room(sum(usage.values()), get_reserved_bytes(usage), reserve):
+            return False
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, OWNER_FILE), 'w') as f:
+            json.dump({"host": socket.gethostname(), "pid": os.getpid(), "created_at": time.time(),
+                       "reserve": reserve}, f)
+    return True
+
+def _admit(job_id, path, reserve):
+    deadline = time.time() + SCRATCH_ADMISSION_TIMEOUT
+    waited = False
+    while not _try_admit(path, reserve):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            with _lock:
+                _stats["rejected"] += 1
+            raise ScratchSpaceUnavailable(
+                f"Not enough scratch space for job {job_id} (needs {reserve} bytes, "
+                f"keeping {SCRATCH_MIN_FREE_BYTES} free)")
+        if get_cancel_reason(job_id):
+            raise JobCancelled(get_cancel_reason(job_id))
+        with _lock:
+            if not waited:
+                waited = True
+                _stats["waited"] += 1
+                logger.info(f"Job {job_id}: waiting for scratch space")
+            # Other workers free space without notifying us, so re-check periodically
+            _lock.wait(min(remaining, 1))
+    with _lock:
+        _stats["admitted"] += 1
+
+@contextmanager
+def job_scratch(job_id, reserve=SCRATCH_JOB_RESERVE_BYTES):
+    """
+    Give a job its own scratch directory for the duration of the block and remove it,
+    with everything the job left behind, afterwards. Waits for disk space first and
+    raises ScratchSpaceUnavailable if none frees up in time. The reservation is kept in
+    the directory's owner file, so it counts for every worker until the directory is gone.
+    """
+    start_janitor()
+    path = os.path.join(SCRATCH_ROOT, job_id)
+    _admit(job_id, path, reserve)
+    try:
+        _dirs[job_id] = path
+        yield path
+    finally:
+        _dirs.pop(job_id, None)
+        shutil.rmtree(path, ignore_errors=True)
+        _invalidate_usage()
+        with _lock:
+            _lock.notify_all()
+
+def _is_orphaned(path):
+    try:
+        owner = _read_owner(path)
+    except (OSError, ValueError):
+        # No marker yet (just created) or written by something else: fall back to age
+        return time.time() - os.stat(path).st_mtime > SCRATCH_MAX_AGE
+    if time.time() - owner.get('created_at', 0) > SCRATCH_MAX_AGE:
+        return True
+    if owner.get('host') != socket.gethostname():
+        return False
+    try:
+        os.kill(owner['pid'], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def reclaim_orphaned_dirs():
+    """Remove job directories whose worker has exited or that are older than SCRATCH_MAX_AGE."""
+    reclaimed = 0
+    for entry in os.scandir(SCRATCH_ROOT):
+        if not entry.is_dir(follow_symlinks=False) or entry.name in _dirs:
+            continue
+        try:
+            if _is_orphaned(entry.path):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                reclaimed += 1
+        except FileNotFoundError:
+            pass
+    if reclaimed:
+        logger.info(f"Reclaimed {reclaimed} orphaned scratch director{'y' if reclaimed == 1 else 'ies'}")
+        _invalidate_usage()
+        with _lock:
+            _stats["reclaimed"] += reclaimed
+            _lock.notify_all()
+    return reclaimed
+
+def _janitor():
+    while True:
+        try:
+            reclaim_orphaned_dirs()
+        except Exception as e:
+            logger.error(f"Scratch janitor failed: {e}")
+        time.sleep(SCRATCH_JANITOR_INTERVAL)
+
+def start_janitor():
+    """Create SCRATCH_ROOT and start the thread that reclaims orphaned job directories, once per process."""
+    global _janitor_started
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    with _lock:
+        if _janitor_started:
+            return
+        _janitor_started = True
+    threading.Thread(target=_janitor, daemon=True).start()
+
+def get_scratch_stats():
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    usage = shutil.disk_usage(SCRATCH_ROOT)
+    dirs = _scan_usage()
+    usage_bytes = sum(dirs.values())
+    reserved = get_reserved_bytes(dirs)
+    with _lock:
+        return {
+            "root": SCRATCH_ROOT,
+            "usage_bytes": usage_bytes,
+            "free_bytes": usage.free,
+            "quota_bytes": SCRATCH_QUOTA_BYTES or None,
+            "min_free_bytes": SCRATCH_MIN_FREE_BYTES,
+            "reserved_bytes": reserved,
+            "active_jobs": len(_dirs),
+            **_stats
+        }
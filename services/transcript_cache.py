@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directory of the host-wide cache of Whisper results; shared by all workers
+TRANSCRIPT_CACHE_DIR = os.environ.get('TRANSCRIPT_CACHE_DIR', '/tmp/nca_transcript_cache')
+# Compressed size the cache may reach before least recently used transcripts are evicted (0 disables the cache)
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 256 * 1024 ** 2))
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _to_json(value):
+    # Whisper may leave numpy scalars (e.g. word probabilities) in its result
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in the transcript cache")
+
+class TranscriptCache:
+    """
+    Whisper results keyed by the SHA-256 of the media file and the decode options that
+    change the output (model, language, task, word timestamps). Each result is stored
+    whole, segments and words included, as zlib-compressed compact JSON in one SQLite
+    file, so any transcription endpoint can reuse what another one computed.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'transcripts.db')
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._stats_lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    media_sha256 TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    word_timestamps INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def get_key(media_sha256, model, language, task, word_timestamps):
+        return f"{media_sha256}:{model}:{language or 'auto'}:{task or 'transcribe'}:{int(bool(word_timestamps))}"
+
+    def get(self, key):
+        """Return the cached Whisper result for key, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+        finally:
+            conn.close()
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(zlib.decompress(row['data']))
+
+    def put(self, key, media_sha256, model, language, task, word_timestamps, result):
+        data = zlib.compress(json.dumps(result, separators=(',', ':'), ensure_ascii=False, default=_to_json).encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("""INSERT OR REPLACE INTO transcripts
+                            (key, media_sha256, model, language, task, word_timestamps, data, size, created_at, last_used)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                         (key, media_sha256, model, language or 'auto', task or 'transcribe', int(bool(word_timestamps)),
+                          data, len(data), now, now))
+        finally:
+            conn.close()
+        self._count("stores")
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used transcripts until the cache fits max_bytes."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+            if total > self.max_bytes:
+                for row in conn.execute("SELECT key, size FROM transcripts ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM transcripts WHERE key = ?", (row['key'],))
+                    total -= row['size']
+                    self._count("evictions")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        finally:
+            conn.close()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "size_bytes": size,
+            "entries": entries,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+            **stats
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_transcript_cache():
+    """Return the process-wide transcript cache, or None if it is disabled or unusable."""
+    global _cache
+    if TRANSCRIPT_CACHE_MAX_BYTES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = TranscriptCache(TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MAX_BYTES)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Transcript cache disabled: {e}")
+                return None
+        return _cache
+
+def get_transcript_cache_stats():
+    cache = get_transcript_cache()
+    return cache.stats() if cache else {"enabled": False}
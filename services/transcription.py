@@ -1,29 +1,25 @@
 import os
-import whisper
 import srt
 from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
+from services.parallel_transcription import transcribe_file
 import logging
 import uuid
+from services.scratch_space import get_scratch_dir
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-STORAGE_PATH = "/tmp/"
-
 def process_transcription(media_url, max_chars=56, language=None):
     """Transcribe media and return all formats."""
     logger.info(f"Starting transcription for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    input_filename = download_file(media_url, os.path.join(get_scratch_dir(), 'input_media'))
     logger.info(f"Downloaded media to local file: {input_filename}")
 
     try:
-        model = whisper.load_model("base")
-        logger.info("Loaded Whisper model")
-
         # Get transcription result once
-        result = model.transcribe(input_filename, language=language)
+        result = transcribe_file(input_filename, "base", language=language)
         logger.info("Transcription completed")
 
         # Generate all formats
@@ -1,9 +1,9 @@
 import os
 import subprocess
 import json
-from services.file_management import download_file
-
-STORAGE_PATH = "/tmp/"
+from services.media_input import open_media_inputs
+from services.job_control import run_process
+from services.scratch_space import get_scratch_dir
 
 def get_extension_from_format(format_name):
     # Mapping of common format names to file extensions
@@ -40,7 +40,7 @@ def get_metadata(filename, metadata_requests, job_id):
             thumbnail_filename
         ]
         try:
-            subprocess.run(thumbnail_command, check=True, capture_output=True, text=True)
+            run_process(thumbnail_command, check=True, capture_output=True, text=True)
             if os.path.exists(thumbnail_filename):
                 metadata['thumbnail'] = thumbnail_filename  # Return local path instead of URL
         except subprocess.CalledProcessError as e:
@@ -58,7 +58,7 @@ def get_metadata(filename, metadata_requests, job_id):
             '-show_streams',
             filename
         ]
-        result = subprocess.run(ffprobe_command, capture_output=True, text=True)
+        result = run_process(ffprobe_command, capture_output=True, text=True)
         probe_data = json.loads(result.stdout)
         
         if metadata_requests.get('duration'):
@@ -88,15 +88,18 @@ def process_ffmpeg_compose(data, job_id):
         if "argument" in option and option["argument"] is not None:
             command.append(str(option["argument"]))
     
-    # Add inputs
-    for input_data in data["inputs"]:
+    # Add inputs, fetched concurrently
+    media_inputs = open_media_inputs([input_data["file_url"] for input_data in data["inputs"]], get_scratch_dir())
+    for input_data, media_input in zip(data["inputs"], media_inputs):
         if "options" in input_data:
             for option in input_data["options"]:
                 command.append(option["option"])
                 if "argument" in option and option["argument"] is not None:
                     command.append(str(option["argument"]))
-        input_path = download_file(input_data["file_url"], STORAGE_PATH)
-        command.extend(["-i", input_path])
+                if option["option"] == "-f":
+                    # The caller chose the input format; do not override it with the detected one
+                    media_input.options.pop('f', None)
+        command.extend(media_input.input_args())
     
     # Add filters
     if data.get("filters"):
@@ -112,7 +115,7 @@ def process_ffmpeg_compose(data, job_id):
                 break
         
         extension = get_extension_from_format(format_name) if format_name else 'mp4'
-        output_filename = os.path.join(STORAGE_PATH, f"{job_id}_output_{i}.{extension}")
+        output_filename = os.path.join(get_scratch_dir(), f"{job_id}_output_{i}.{extension}")
         output_filenames.append(output_filename)
         
         for option in output["options"]:
@@ -123,15 +126,13 @@ def process_ffmpeg_compose(data, job_id):
     
     # Execute FFmpeg command
     try:
-        subprocess.run(command, check=True, capture_output=True, text=True)
+        run_process(command, check=True, capture_output=True, text=True)
     except subprocess.CalledProcessError as e:
         raise Exception(f"FFmpeg command failed: {e.stderr}")
-    
-    # Clean up input files
-    for input_data in data["inputs"]:
-        input_path = os.path.join(STORAGE_PATH, os.path.basename(input_data["file_url"]))
-        if os.path.exists(input_path):
-            os.remove(input_path)
+    finally:
+        # Clean up input files
+        for media_input in media_inputs:
+            media_input.cleanup()
     
     # Get metadata if requested
     metadata = []
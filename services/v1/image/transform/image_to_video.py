@@ -1,17 +1,27 @@
 import os
 import subprocess
 import logging
-from services.file_management import download_file
+from services.file_management import download_media
 from PIL import Image
+from services.job_control import run_process
+from services.media_output import encode_and_upload
+from services.scratch_space import get_scratch_dir
 
-STORAGE_PATH = "/tmp/"
 logger = logging.getLogger(__name__)
 
-def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, webhook_url=None):
+def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, webhook_url=None, upload=False):
+    """
+    Render a zooming video from an image and return its local path, or with upload=True
+    upload it (streaming during encoding if FFMPEG_STREAM_UPLOADS is set) and return its URL.
+    """
     try:
         # Download the image file
-        image_path = download_file(image_url, STORAGE_PATH)
-        logger.info(f"Downloaded image to {image_path}")
+        image = download_media(image_url, get_scratch_dir())
+        image_path = image.path
+        logger.info(f"Downloaded image to {image_path} ({image.mime}, {image.size} bytes)")
+        if image.container and not image.is_image:
+            os.remove(image_path)
+            raise ValueError(f"{image_url} is not an image (detected {image.container})")
 
         # Get image dimensions using Pillow
         with Image.open(image_path) as img:
@@ -19,7 +29,7 @@ def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, we
         logger.info(f"Original image dimensions: {width}x{height}")
 
         # Prepare the output path
-        output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
+        output_path = os.path.join(get_scratch_dir(), f"{job_id}.mp4")
 
         # Determine orientation and set appropriate dimensions
         if width > height:
@@ -46,8 +56,14 @@ def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, we
 
         logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
 
+        if upload:
+            try:
+                return encode_and_upload(cmd, output_path)
+            finally:
+                os.remove(image_path)
+
         # Run FFmpeg command
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = run_process(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             logger.error(f"FFmpeg command failed. Error: {result.stderr}")
             raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
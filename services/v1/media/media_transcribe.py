@@ -1,30 +1,28 @@
 import os
-import whisper
 import srt
 from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
+from services.parallel_transcription import transcribe_file
+from services.job_registry import job_registry
 import logging
+from services.scratch_space import get_scratch_dir
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
-
 def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id):
     """Transcribe or translate media and return the transcript/translation, SRT or VTT file path."""
     logger.info(f"Starting {task} for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    job_registry.set_stage(job_id, "downloading")
+    input_filename = download_file(media_url, os.path.join(get_scratch_dir(), 'input_media'))
     logger.info(f"Downloaded media to local file: {input_filename}")
 
     try:
         # Load a larger model for better translation quality
         #model_size = "large" if task == "translate" else "base"
         model_size = "base"
-        model = whisper.load_model(model_size)
-        logger.info(f"Loaded Whisper {model_size} model")
 
         # Configure transcription/translation options
         options = {
@@ -37,7 +35,8 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if language:
             options["language"] = language
 
-        result = model.transcribe(input_filename, **options)
+        job_registry.set_stage(job_id, "transcribing")
+        result = transcribe_file(input_filename, model_size, **options)
         
         # For translation task, the result['text'] will be in English
         text = None
@@ -72,21 +71,21 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         else:
             
             if include_text is True:
-                text_filename = os.path.join(STORAGE_PATH, f"{job_id}.txt")
+                text_filename = os.path.join(get_scratch_dir(), f"{job_id}.txt")
                 with open(text_filename, 'w') as f:
                     f.write(text)
             else:
                 text_file = None
             
             if include_srt is True:
-                srt_filename = os.path.join(STORAGE_PATH, f"{job_id}.srt")
+                srt_filename = os.path.join(get_scratch_dir(), f"{job_id}.srt")
                 with open(srt_filename, 'w') as f:
                     f.write(srt_text)
             else:
                 srt_filename = None
 
             if include_segments is True:
-                segments_filename = os.path.join(STORAGE_PATH, f"{job_id}.json")
+                segments_filename = os.path.join(get_scratch_dir(), f"{job_id}.json")
                 with open(segments_filename, 'w') as f:
                     f.write(str(segments_json))
             else:
@@ -2,26 +2,26 @@ import os
 import ffmpeg
 import requests
 from services.file_management import download_file
-
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
+from services.media_input import open_media_input
+from services.job_control import run_ffmpeg
+from services.scratch_space import get_scratch_dir
 
 def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
     """Convert media to MP3 format with specified bitrate."""
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input"))
+    media_input = open_media_input(media_url, os.path.join(get_scratch_dir(), f"{job_id}_input"))
     output_filename = f"{job_id}.mp3"
-    output_path = os.path.join(STORAGE_PATH, output_filename)
+    output_path = os.path.join(get_scratch_dir(), output_filename)
 
     try:
         # Convert media file to MP3 with specified bitrate
-        (
+        run_ffmpeg(
             ffmpeg
-            .input(input_filename)
+            .input(media_input.source, **media_input.options)
             .output(output_path, acodec='libmp3lame', audio_bitrate=bitrate)
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+            .overwrite_output(),
+            capture_stdout=True, capture_stderr=True
         )
-        os.remove(input_filename)
+        media_input.cleanup()
         print(f"Conversion successful: {output_path} with bitrate {bitrate}")
 
         # Ensure the output file exists locally before attempting upload
@@ -38,27 +38,27 @@ def process_video_combination(media_urls, job_id, webhook_url=None):
     """Combine multiple videos into one."""
     input_files = []
     output_filename = f"{job_id}.mp4"
-    output_path = os.path.join(STORAGE_PATH, output_filename)
+    output_path = os.path.join(get_scratch_dir(), output_filename)
 
     try:
         # Download all media files
         for i, media_item in enumerate(media_urls):
             url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
+            input_filename = download_file(url, os.path.join(get_scratch_dir(), f"{job_id}_input_{i}"))
             input_files.append(input_filename)
 
         # Generate an absolute path concat list file for FFmpeg
-        concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
+        concat_file_path = os.path.join(get_scratch_dir(), f"{job_id}_concat_list.txt")
         with open(concat_file_path, 'w') as concat_file:
             for input_file in input_files:
                 # Write absolute paths to the concat list
                 concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
 
         # Use the concat demuxer to concatenate the videos
-        (
+        run_ffmpeg(
             ffmpeg.input(concat_file_path, format='concat', safe=0).
-                output(output_path, c='copy').
-                run(overwrite_output=True)
+                output(output_path, c='copy'),
+            overwrite_output=True
         )
 
         # Clean up input files
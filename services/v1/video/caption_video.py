@@ -2,14 +2,18 @@ import os
 import ffmpeg
 import logging
 import subprocess
-import whisper
 from datetime import timedelta
 import srt
 import re
 from services.file_management import download_file
+from services.parallel_transcription import transcribe_file
+from services.job_registry import job_registry
 from services.cloud_storage import upload_file  # Ensure this import is present
 import requests  # Ensure requests is imported for webhook handling
 from urllib.parse import urlparse
+from services.job_control import run_ffmpeg
+from services.media_output import encode_and_upload
+from services.scratch_space import get_scratch_dir
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -20,8 +24,6 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-STORAGE_PATH = "/tmp/"
-
 POSITION_ALIGNMENT_MAP = {
     "bottom_left": 1,
     "bottom_center": 2,
@@ -47,14 +49,13 @@ def rgb_to_ass_color(rgb_color):
 
 def generate_transcription(video_path, language='auto'):
     try:
-        model = whisper.load_model("base")
         transcription_options = {
             'word_timestamps': True,
             'verbose': True,
         }
         if language != 'auto':
             transcription_options['language'] = language
-        result = model.transcribe(video_path, **transcription_options)
+        result = transcribe_file(video_path, "base", **transcription_options)
         logger.info(f"Transcription generated successfully for video: {video_path}")
         return result
     except Exception as e:
@@ -623,10 +624,12 @@ def process_subtitle_events(transcription_result, style_type, settings, replace_
     """
     return srt_to_ass(transcription_result, style_type, settings, replace_dict, video_resolution)
 
-def process_captioning_v1(video_url, captions, settings, replace, job_id, language='auto'):
+def process_captioning_v1(video_url, captions, settings, replace, job_id, language='auto', upload=False):
     """
     Captioning process with transcription fallback and multiple styles.
     Integrates with the updated logic for positioning and alignment.
+    With upload=True the captioned video is uploaded and its URL returned instead of
+    the local path, streaming it to storage during encoding if FFMPEG_STREAM_UPLOADS is set.
     """
     try:
         if not isinstance(settings, dict):
@@ -683,7 +686,8 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
                 video_path = video_url
                 logger.info(f"Job {job_id}: Using existing video at {video_path}")
             else:
-                video_path = download_file(video_url, STORAGE_PATH)
+                job_registry.set_stage(job_id, "downloading")
+                video_path = download_file(video_url, get_scratch_dir())
                 logger.info(f"Job {job_id}: Video downloaded to {video_path}")
         except Exception as e:
             logger.error(f"Job {job_id}: Video access error: {str(e)}")
@@ -720,6 +724,7 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
         else:
             # No captions provided, generate transcription
             logger.info(f"Job {job_id}: No captions provided, generating transcription.")
+            job_registry.set_stage(job_id, "transcribing")
             transcription_result = generate_transcription(video_path, language=language)
             # Generate ASS based on chosen style
             subtitle_content = process_subtitle_events(transcription_result, style_type, style_options, replace_dict, video_resolution)
@@ -736,7 +741,7 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
 
         # Save the subtitle content
         subtitle_filename = f"{job_id}.{subtitle_type}"
-        subtitle_path = os.path.join(STORAGE_PATH, subtitle_filename)
+        subtitle_path = os.path.join(get_scratch_dir(), subtitle_filename)
         try:
             with open(subtitle_path, 'w', encoding='utf-8') as f:
                 f.write(subtitle_content)
@@ -747,15 +752,25 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
 
         # Prepare output filename and path
         output_filename = f"{job_id}_captioned.mp4"
-        output_path = os.path.join(STORAGE_PATH, output_filename)
+        output_path = os.path.join(get_scratch_dir(), output_filename)
 
         # Process video with subtitles using FFmpeg
+        job_registry.set_stage(job_id, "encoding")
+        encode = ffmpeg.input(video_path).output(
+            output_path,
+            vf=f"subtitles='{subtitle_path}'",
+            acodec='copy'
+        )
+        if upload:
+            try:
+                cloud_url = encode_and_upload(ffmpeg.compile(encode, overwrite_output=True), output_path)
+                logger.info(f"Job {job_id}: Captioned video encoded and uploaded to {cloud_url}")
+                return cloud_url
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Job {job_id}: FFmpeg error: {e.stderr}")
+                return {"error": f"FFmpeg error: {e.stderr}"}
         try:
-            ffmpeg.input(video_path).output(
-                output_path,
-                vf=f"subtitles='{subtitle_path}'",
-                acodec='copy'
-            ).run(overwrite_output=True)
+            run_ffmpeg(encode, overwrite_output=True)
             logger.info(f"Job {job_id}: FFmpeg processing completed. Output saved to {output_path}")
         except ffmpeg.Error as e:
             stderr_output = e.stderr.decode('utf8') if e.stderr else 'Unknown error'
@@ -2,35 +2,36 @@ import os
 import ffmpeg
 import requests
 from services.file_management import download_file
-
-# Set the default local storage directory
-STORAGE_PATH = "/tmp/"
+from services.job_control import run_ffmpeg
+from services.downloader import fetch_concurrently
+from services.scratch_space import get_scratch_dir
 
 def process_video_concatenate(media_urls, job_id, webhook_url=None):
     """Combine multiple videos into one."""
     input_files = []
     output_filename = f"{job_id}.mp4"
-    output_path = os.path.join(STORAGE_PATH, output_filename)
+    output_path = os.path.join(get_scratch_dir(), output_filename)
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
+        # Download all media files concurrently, keeping their order
+        input_files = fetch_concurrently(
+            lambda url, i: download_file(url, os.path.join(get_scratch_dir(), f"{job_id}_input_{i}")),
+            [media_item['video_url'] for media_item in media_urls],
+            os.remove
+        )
 
         # Generate an absolute path concat list file for FFmpeg
-        concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
+        concat_file_path = os.path.join(get_scratch_dir(), f"{job_id}_concat_list.txt")
         with open(concat_file_path, 'w') as concat_file:
             for input_file in input_files:
                 # Write absolute paths to the concat list
                 concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
 
         # Use the concat demuxer to concatenate the videos
-        (
+        run_ffmpeg(
             ffmpeg.input(concat_file_path, format='concat', safe=0).
-                output(output_path, c='copy').
-                run(overwrite_output=True)
+                output(output_path, c='copy'),
+            overwrite_output=True
         )
 
         # Clean up input files
@@ -0,0 +1,123 @@
+import os
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Drop non-speech regions from the audio before it is passed to Whisper
+TRANSCRIBE_VAD = os.environ.get('TRANSCRIBE_VAD', 'false').lower() in ('1', 'true')
+# Only gaps without speech at least this long (seconds) are dropped
+TRANSCRIBE_VAD_MIN_SILENCE_SECONDS = float(os.environ.get('TRANSCRIBE_VAD_MIN_SILENCE_SECONDS', 2.0))
+# Audio kept on both sides of every speech region, so word onsets and endings are not clipped
+TRANSCRIBE_VAD_PADDING_SECONDS = float(os.environ.get('TRANSCRIBE_VAD_PADDING_SECONDS', 0.3))
+# A frame is speech when it is this many dB above the recording's noise floor
+TRANSCRIBE_VAD_THRESHOLD_DB = float(os.environ.get('TRANSCRIBE_VAD_THRESHOLD_DB', 12))
+
+SAMPLE_RATE = 16000
+# 30 ms analysis frames
+FRAME = SAMPLE_RATE * 3 // 100
+# Frames quieter than this are silence whatever the noise floor (digital silence, fades)
+MIN_SPEECH_DB = -55
+# Percentile of frame levels taken as the noise floor
+NOISE_FLOOR_PERCENTILE = 10
+
+_stats = {"files": 0, "audio_seconds": 0.0, "skipped_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def detect_speech(audio):
+    """
+    Return (start, end) sample ranges of audio that contain speech. A 30 ms frame counts
+    as speech when its level is TRANSCRIBE_VAD_THRESHOLD_DB above the noise floor; ranges
+    are padded and merged across gaps shorter than TRANSCRIBE_VAD_MIN_SILENCE_SECONDS.
+    """
+    import numpy as np
+    frames = len(audio) // FRAME
+    if frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+    energy = np.square(audio[:frames * FRAME].reshape(frames, FRAME)).mean(axis=1)
+    levels = 10 * np.log10(energy + 1e-10)
+    threshold = max(np.percentile(levels, NOISE_FLOOR_PERCENTILE) + TRANSCRIBE_VAD_THRESHOLD_DB, MIN_SPEECH_DB)
+    speech = np.flatnonzero(levels > threshold)
+    if len(speech) == 0:
+        return []
+
+    padding = int(TRANSCRIBE_VAD_PADDING_SECONDS * SAMPLE_RATE)
+    min_gap = int(TRANSCRIBE_VAD_MIN_SILENCE_SECONDS * SAMPLE_RATE)
+    # Runs of consecutive speech frames, as sample ranges
+    breaks = np.flatnonzero(np.diff(speech) > 1)
+    starts = np.concatenate(([speech[0]], speech[breaks + 1])) * FRAME
+    ends = (np.concatenate((speech[breaks], [speech[-1]])) + 1) * FRAME
+
+    regions = []
+    for start, end in zip(starts, ends):
+        start, end = max(0, int(start) - padding), min(len(audio), int(end) + padding)
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+class TimeMap:
+    """Maps times in audio with the silences removed back to times in the original audio."""
+    def __init__(self, regions):
+        self.regions = regions
+        self.offsets = []
+        position = 0
+        for start, end in regions:
+            self.offsets.append(position)
+            position += end - start
+
+    def to_original(self, seconds, is_end=False):
+        sample = seconds * SAMPLE_RATE
+        # An end that falls exactly on a join belongs to the region before it
+        index = (bisect.bisect_left if is_end else bisect.bisect_right)(self.offsets, sample) - 1
+        index = min(max(index, 0), len(self.regions) - 1)
+        start, end = self.regions[index]
+        return round(min(start + sample - self.offsets[index], end) / SAMPLE_RATE, 3)
+
+    def apply(self, result):
+        """Rewrite segment and word timestamps of a Whisper result in place to original times."""
+        for segment in result['segments']:
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = self.to_original(segment['end'], is_end=True)
+            segment['seek'] = round(self.to_original(segment.get('seek', 0) / 100) * 100)
+            for word in segment.get('words') or []:
+                word['start'] = self.to_original(word['start'])
+                word['end'] = self.to_original(word['end'], is_end=True)
+        return result
+
+def remove_silence(audio):
+    """
+    Return the audio with its non-speech regions cut out, the TimeMap back to the original,
+    and a report of how much was skipped.
+    """
+    import numpy as np
+    regions = detect_speech(audio)
+    speech = np.concatenate([audio[start:end] for start, end in regions]) if regions else audio[:0]
+    audio_seconds = len(audio) / SAMPLE_RATE
+    skipped_seconds = (len(audio) - len(speech)) / SAMPLE_RATE
+    report = {
+        "audio_seconds": round(audio_seconds, 1),
+        "speech_seconds": round(len(speech) / SAMPLE_RATE, 1),
+        "skipped_seconds": round(skipped_seconds, 1),
+        "skipped_ratio": round(skipped_seconds / audio_seconds, 3) if audio_seconds else 0,
+        "regions": len(regions)
+    }
+    with _stats_lock:
+        _stats["files"] += 1
+        _stats["audio_seconds"] += audio_seconds
+        _stats["skipped_seconds"] += skipped_seconds
+    logger.info(f"Voice activity detection kept {report['speech_seconds']}s of {report['audio_seconds']}s "
+                f"in {len(regions)} regions, skipping {report['skipped_seconds']}s")
+    return speech, TimeMap(regions), report
+
+def get_vad_stats():
+    with _stats_lock:
+        return {
+            "enabled": TRANSCRIBE_VAD,
+            "files": _stats["files"],
+            "audio_seconds": round(_stats["audio_seconds"], 1),
+            "skipped_seconds": round(_stats["skipped_seconds"], 1),
+            "skipped_ratio": round(_stats["skipped_seconds"] / _stats["audio_seconds"], 3) if _stats["audio_seconds"] else None
+        }
@@ -1,14 +1,211 @@
-import requests
+import os
+import json
+import time
+import heapq
+import random
+import sqlite3
 import logging
+import itertools
+import threading
+from collections import deque
+import requests
+from services.downloader import get_session
+from services.payload_logging import log_payload
 
 logger = logging.getLogger(__name__)
 
+# Threads delivering webhooks for this worker
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 4))
+# Deliveries waiting or being retried; beyond this new webhooks go straight to the dead-letter store
+WEBHOOK_MAX_PENDING = int(os.environ.get('WEBHOOK_MAX_PENDING', 1000))
+# Seconds to wait for the receiver to accept the connection and to answer
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+# Attempts before a webhook is dead-lettered, and the backoff between them (doubling, capped)
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 5))
+WEBHOOK_BACKOFF_BASE = float(os.environ.get('WEBHOOK_BACKOFF_BASE', 2))
+WEBHOOK_BACKOFF_MAX = float(os.environ.get('WEBHOOK_BACKOFF_MAX', 300))
+# SQLite file keeping webhooks that could not be delivered
+WEBHOOK_DEAD_LETTER_PATH = os.environ.get('WEBHOOK_DEAD_LETTER_PATH', '/tmp/nca_webhook_dead_letters.db')
+
+# Number of recent deliveries used for the latency percentiles in /v1/toolkit/metrics
+WEBHOOK_LATENCY_WINDOW = 200
+
+class Delivery:
+    def __init__(self, webhook_url, body):
+        self.webhook_url = webhook_url
+        self.body = body
+        self.attempts = 0
+        self.created_at = time.time()
+        self.last_error = None
+
+class DeadLetterStore:
+    """Webhooks that exhausted their attempts, kept on disk so their results are not lost."""
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    webhook_url TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def add(self, delivery):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO dead_letters (webhook_url, body, attempts, last_error, created_at, failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         (delivery.webhook_url, delivery.body, delivery.attempts, delivery.last_error, delivery.created_at, time.time()))
+        finally:
+            conn.close()
+
+class WebhookDispatcher:
+    """
+    Bounded pool of threads that delivers webhooks independently of job execution.
+    Failed attempts (connection errors, timeouts, 429 and 5xx answers) are retried with
+    exponential backoff and jitter; deliveries that exhaust WEBHOOK_MAX_ATTEMPTS or are
+    rejected with another 4xx are written to the dead-letter store.
+    """
+    def __init__(self, workers=WEBHOOK_WORKERS, max_pending=WEBHOOK_MAX_PENDING, dead_letter_path=WEBHOOK_DEAD_LETTER_PATH):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.dead_letter_path = dead_letter_path
+        self._dead_letters = None
+        self._heap = []
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._started = False
+        self._latencies = deque(maxlen=WEBHOOK_LATENCY_WINDOW)
+        self._stats = {"submitted": 0, "delivered": 0, "retries": 0, "dead_lettered": 0}
+
+    def _start(self):
+        """Start the delivery threads. Caller holds _condition."""
+        self._started = True
+        for _ in range(max(1, self.workers)):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, webhook_url, data):
+        """Queue data for delivery to webhook_url and return at once."""
+        delivery = Delivery(webhook_url, json.dumps(data))
+        with self._condition:
+            if not self._started:
+                self._start()
+            self._stats["submitted"] += 1
+            if len(self._heap) + self._in_flight >= self.max_pending:
+                delivery.last_error = f"delivery queue full ({self.max_pending} pending)"
+                full = True
+            else:
+                self._schedule(delivery, time.time())
+                full = False
+        if full:
+            logger.error(f"Webhook to {webhook_url} not queued: {delivery.last_error}")
+            self._dead_letter(delivery)
+
+    def _schedule(self, delivery, due_at):
+        """Caller holds _condition."""
+        heapq.heappush(self._heap, (due_at, next(self._sequence), delivery))
+        self._condition.notify()
+
+    def _next(self):
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    self._in_flight += 1
+                    return heapq.heappop(self._heap)[2]
+                self._condition.wait(self._heap[0][0] - now if self._heap else None)
+
+    def _run(self):
+        while True:
+            delivery = self._next()
+            try:
+                self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook delivery to {delivery.webhook_url} crashed: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+
+    def _attempt(self, delivery):
+        delivery.attempts += 1
+        retryable = True
+        try:
+            response = get_session(delivery.webhook_url).post(
+                delivery.webhook_url, data=delivery.body, headers={'Content-Type': 'application/json'},
+                timeout=WEBHOOK_TIMEOUT)
+            response.close()
+            if response.status_code < 400:
+                latency = time.time() - delivery.created_at
+                with self._condition:
+                    self._stats["delivered"] += 1
+                    self._latencies.append(latency)
+                logger.info(f"Webhook delivered to {delivery.webhook_url} (attempt {delivery.attempts}, {latency:.2f}s after the job finished)")
+                return
+            delivery.last_error = f"HTTP {response.status_code}"
+            retryable = response.status_code == 429 or response.status_code >= 500
+        except requests.RequestException as e:
+            delivery.last_error = str(e)
+
+        if retryable and delivery.attempts < WEBHOOK_MAX_ATTEMPTS:
+            delay = min(WEBHOOK_BACKOFF_BASE * 2 ** (delivery.attempts - 1), WEBHOOK_BACKOFF_MAX)
+            delay *= random.uniform(0.5, 1)
+            logger.warning(f"Webhook to {delivery.webhook_url} failed ({delivery.last_error}); retrying in {delay:.1f}s")
+            with self._condition:
+                self._stats["retries"] += 1
+                self._schedule(delivery, time.time() + delay)
+            return
+        logger.error(f"Webhook to {delivery.webhook_url} failed after {delivery.attempts} attempt(s): {delivery.last_error}")
+        self._dead_letter(delivery)
+
+    def _dead_letter(self, delivery):
+        with self._condition:
+            self._stats["dead_lettered"] += 1
+            if self._dead_letters is None:
+                try:
+                    self._dead_letters = DeadLetterStore(self.dead_letter_path)
+                except (OSError, sqlite3.Error) as e:
+                    logger.error(f"Webhook dead-letter store unavailable: {e}")
+                    return
+        try:
+            self._dead_letters.add(delivery)
+        except sqlite3.Error as e:
+            logger.error(f"Could not dead-letter webhook to {delivery.webhook_url}: {e}")
+
+    def stats(self):
+        with self._condition:
+            latencies = sorted(self._latencies)
+            stats = {
+                "workers": self.workers,
+                "pending": len(self._heap) + self._in_flight,
+                "max_pending": self.max_pending,
+                **self._stats,
+                "avg_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+                "p50_latency_seconds": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "p95_latency_seconds": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            }
+        stats["dead_letter_store"] = self.dead_letter_path
+        return stats
+
+_dispatcher = WebhookDispatcher()
+
 def send_webhook(webhook_url, data):
-    """Send a POST request to a webhook URL with the provided data."""
-    try:
-        logger.info(f"Attempting to send webhook to {webhook_url} with data: {data}")
-        response = requests.post(webhook_url, json=data)
-        response.raise_for_status()
-        logger.info(f"Webhook sent: {data}")
-    except requests.RequestException as e:
-        logger.error(f"Webhook failed: {e}")
+    """Queue a POST of data to webhook_url on the delivery pool; never blocks the caller."""
+    log_payload(logger, logging.INFO, f"Queueing webhook to {webhook_url}", data)
+    _dispatcher.submit(webhook_url, data)
+
+def get_webhook_stats():
+    return _dispatcher.stats()
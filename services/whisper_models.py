@@ -0,0 +1,169 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of distinct model sizes kept resident per worker (LRU evicted beyond this)
+WHISPER_MAX_MODELS = int(os.environ.get('WHISPER_MAX_MODELS', 2))
+# Seconds a model may sit unused before it is evicted (0 disables idle eviction)
+WHISPER_MODEL_IDLE_TIMEOUT = int(os.environ.get('WHISPER_MODEL_IDLE_TIMEOUT', 0))
+
+class ModelEntry:
+    """A resident Whisper model plus its usage statistics."""
+    def __init__(self, model_size, model, load_time):
+        self.model_size = model_size
+        self.model = model
+        self.load_time = load_time
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.memory_bytes = get_model_memory(model)
+        # Whisper installs kv-cache hooks on the shared module for every decode,
+        # so concurrent transcribe() calls on one instance must be serialized.
+        self.inference_lock = threading.Lock()
+        # Requests holding or waiting for the model through acquire_model; never evicted while > 0
+        self.users = 0
+
+_models = OrderedDict()
+_registry_lock = threading.Lock()
+_load_locks = {}
+_stats = {}
+_janitor_started = False
+
+def get_model_memory(model):
+    """Return the number of bytes held by a model's parameters and buffers."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return 0
+
+def _get_stats(model_size):
+    if model_size not in _stats:
+        _stats[model_size] = {"loads": 0, "hits": 0, "misses": 0, "evictions": 0, "total_load_time": 0.0}
+    return _stats[model_size]
+
+def _evict(model_size, reason):
+    entry = _models.pop(model_size, None)
+    if entry:
+        _get_stats(model_size)["evictions"] += 1
+        logger.info(f"Evicted Whisper {model_size} model ({reason}), freed ~{entry.memory_bytes / (1024 * 1024):.1f} MB")
+
+def _enforce_limits():
+    """Drop idle models and trim the registry to WHISPER_MAX_MODELS. Caller holds _registry_lock."""
+    if WHISPER_MODEL_IDLE_TIMEOUT > 0:
+        now = time.time()
+        for model_size in [s for s, e in _models.items() if now - e.last_used > WHISPER_MODEL_IDLE_TIMEOUT]:
+            if not _models[model_size].users:
+                _evict(model_size, "idle")
+    if WHISPER_MAX_MODELS > 0 and len(_models) > WHISPER_MAX_MODELS:
+        # Models in use stay resident (evicting one would only lead to a second copy being
+        # loaded); they are trimmed when released if the registry is still over the limit
+        for model_size in [s for s, e in _models.items() if not e.users]:
+            if len(_models) <= WHISPER_MAX_MODELS:
+                break
+            _evict(model_size, "lru")
+
+def _janitor():
+    while True:
+        time.sleep(max(1, WHISPER_MODEL_IDLE_TIMEOUT // 2))
+        with _registry_lock:
+            _enforce_limits()
+
+def _start_janitor():
+    global _janitor_started
+    if WHISPER_MODEL_IDLE_TIMEOUT > 0 and not _janitor_started:
+        _janitor_started = True
+        threading.Thread(target=_janitor, daemon=True).start()
+
+def _get_entry(model_size, use=False):
+    """Return the entry for model_size, loading it if needed. With use, it is marked in use until _release."""
+    with _registry_lock:
+        entry = _models.get(model_size)
+        if entry:
+            _models.move_to_end(model_size)
+            entry.last_used = time.time()
+            entry.users += use
+            _get_stats(model_size)["hits"] += 1
+            return entry
+        _get_stats(model_size)["misses"] += 1
+        load_lock = _load_locks.setdefault(model_size, threading.Lock())
+
+    # Load outside the registry lock so other sizes stay available, but only once per size
+    with load_lock:
+        with _registry_lock:
+            entry = _models.get(model_size)
+            if entry:
+                entry.last_used = time.time()
+                entry.users += use
+                return entry
+
+        import whisper
+        logger.info(f"Loading Whisper {model_size} model")
+        start_time = time.time()
+        model = whisper.load_model(model_size)
+        load_time = time.time() - start_time
+        entry = ModelEntry(model_size, model, load_time)
+        entry.users += use
+        logger.info(f"Loaded Whisper {model_size} model in {load_time:.2f}s ({entry.memory_bytes / (1024 * 1024):.1f} MB)")
+
+        with _registry_lock:
+            stats = _get_stats(model_size)
+            stats["loads"] += 1
+            stats["total_load_time"] += load_time
+            _models[model_size] = entry
+            _models.move_to_end(model_size)
+            _enforce_limits()
+            _start_janitor()
+        return entry
+
+def _release(entry):
+    with _registry_lock:
+        entry.users -= 1
+        entry.last_used = time.time()
+        _enforce_limits()
+
+def get_model(model_size="base"):
+    """Return the resident Whisper model for model_size, loading it once per worker."""
+    return _get_entry(model_size).model
+
+@contextmanager
+def acquire_model(model_size="base"):
+    """Yield the shared Whisper model with exclusive use for the duration of a transcription."""
+    entry = _get_entry(model_size, use=True)
+    try:
+        with entry.inference_lock:
+            entry.last_used = time.time()
+            yield entry.model
+    finally:
+        _release(entry)
+
+def get_model_stats():
+    """Return load counts, hit rates and resident memory for every model size seen by this worker."""
+    with _registry_lock:
+        models = {}
+        for model_size, stats in _stats.items():
+            entry = _models.get(model_size)
+            requests_total = stats["hits"] + stats["misses"]
+            models[model_size] = {
+                "resident": entry is not None,
+                "loads": stats["loads"],
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+                "evictions": stats["evictions"],
+                "hit_rate": round(stats["hits"] / requests_total, 3) if requests_total else None,
+                "avg_load_time": round(stats["total_load_time"] / stats["loads"], 3) if stats["loads"] else None,
+                "memory_bytes": entry.memory_bytes if entry else 0,
+                "in_use": entry.users > 0 if entry else False,
+                "idle_seconds": round(time.time() - entry.last_used, 1) if entry else None
+            }
+        return {
+            "pid": os.getpid(),
+            "max_models": WHISPER_MAX_MODELS,
+            "idle_timeout": WHISPER_MODEL_IDLE_TIMEOUT,
+            "resident_memory_bytes": sum(e.memory_bytes for e in _models.values()),
+            "models": models
+        }
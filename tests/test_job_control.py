@@ -0,0 +1,48 @@
+import subprocess
+import pytest
+from services.job_control import open_process_output, get_deadline_at
+
+def read_all(output, size):
+    chunks = []
+    while True:
+        data = output.read(size)
+        chunks.append(data)
+        if len(data) < size:
+            return b''.join(chunks)
+
+def test_complete_output_is_returned():
+    with open_process_output(['sh', '-c', 'printf complete-output']) as output:
+        assert read_all(output, 4) == b'complete-output'
+        assert output.tell() == len(b'complete-output')
+
+def test_short_read_of_failed_command_raises():
+    # A consumer that stops at the first short read (such as a single-part upload) must see the failure
+    with open_process_output(['sh', '-c', 'printf partial-output; echo broken >&2; exit 1']) as output:
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            output.read(1024)
+    assert error.value.returncode == 1
+    assert 'broken' in error.value.stderr
+
+def test_read_to_eof_of_failed_command_raises():
+    with open_process_output(['sh', '-c', 'printf partial-output; exit 3']) as output:
+        with pytest.raises(subprocess.CalledProcessError):
+            output.read()
+
+def test_full_reads_do_not_wait_for_the_command():
+    with open_process_output(['sh', '-c', 'printf 0123456789; sleep 30']) as output:
+        assert output.read(10) == b'0123456789'
+        assert output.process.poll() is None
+
+def test_deadline_in_seconds_is_relative_to_acceptance():
+    assert get_deadline_at(30, 1000.0) == 1030.0
+    assert get_deadline_at(None, 1000.0) is None
+
+def test_deadline_timestamps_are_utc_unless_zoned():
+    assert get_deadline_at('1970-01-01T00:01:00Z', 0) == 60
+    assert get_deadline_at('1970-01-01T00:01', 0) == 60
+    assert get_deadline_at('1970-01-01T01:01:00+01:00', 0) == 60
+
+@pytest.mark.parametrize('deadline', ['2024-13-45T99:99', '2024-02-30T10:00', 'tomorrow', True])
+def test_invalid_deadline_raises_value_error(deadline):
+    with pytest.raises(ValueError):
+        get_deadline_at(deadline, 0)
@@ -0,0 +1,21 @@
+from services.job_dedup import get_dedup_key
+
+def test_same_payload_gives_same_key_regardless_of_order():
+    assert (get_dedup_key('/v1/media/transcribe', {'media_url': 'u', 'task': 'transcribe'}) ==
+            get_dedup_key('/v1/media/transcribe', {'task': 'transcribe', 'media_url': 'u'}))
+
+def test_per_request_fields_are_ignored():
+    base = get_dedup_key('/v1/media/transcribe', {'media_url': 'u'})
+    assert get_dedup_key('/v1/media/transcribe', {'media_url': 'u', 'id': 'a', 'webhook_url': 'http://hook',
+                                                  'deadline': 60, 'priority': 9}) == base
+
+def test_payload_and_endpoint_change_the_key():
+    base = get_dedup_key('/v1/media/transcribe', {'media_url': 'u'})
+    assert get_dedup_key('/v1/media/transcribe', {'media_url': 'v'}) != base
+    assert get_dedup_key('/v1/media/generate-srt', {'media_url': 'u'}) != base
+
+def test_idempotency_key_replaces_the_payload():
+    key = get_dedup_key('/v1/video/caption', {'video_url': 'u'}, 'client-key')
+    assert get_dedup_key('/v1/video/caption', {'video_url': 'other'}, 'client-key') == key
+    assert get_dedup_key('/v1/video/caption', {'video_url': 'u'}) != key
+    assert get_dedup_key('/caption-video', {'video_url': 'u'}, 'client-key') != key
@@ -0,0 +1,36 @@
+import pytest
+from services import job_priority
+from services.job_priority import PriorityTaskQueue, get_queue_key, get_effective_priority
+
+aging = pytest.mark.skipif(job_priority.QUEUE_PRIORITY_AGING <= 0, reason="priority aging is disabled")
+
+def test_higher_priority_runs_first_at_the_same_time():
+    assert get_queue_key(9, 1000) < get_queue_key(5, 1000) < get_queue_key(0, 1000)
+
+@aging
+def test_waiting_one_aging_period_equals_one_priority_level():
+    period = job_priority.QUEUE_PRIORITY_AGING
+    assert get_queue_key(4, 1000) == get_queue_key(5, 1000 + period)
+    # A low priority job that has waited long enough overtakes newer high priority jobs
+    assert get_queue_key(0, 1000) < get_queue_key(9, 1000 + 10 * period)
+
+@aging
+def test_effective_priority_grows_with_waiting_time():
+    period = job_priority.QUEUE_PRIORITY_AGING
+    assert get_effective_priority(3, 1000, 1000) == 3
+    assert get_effective_priority(3, 1000, 1000 + 2 * period) == 5
+
+def test_priority_task_queue_order():
+    queue = PriorityTaskQueue()
+    queue.put('low', priority=1, enqueued_at=1000)
+    queue.put('high', priority=8, enqueued_at=1001)
+    queue.put('default', enqueued_at=1000)
+    queue.put('default, later', enqueued_at=1000)
+    assert [queue.get() for _ in range(queue.qsize())] == ['high', 'default', 'default, later', 'low']
+
+def test_key_priorities_are_parsed_and_clamped():
+    assert job_priority._parse_key_priorities('batch:2, interactive:8,,') == {'batch': 2, 'interactive': 8}
+    assert job_priority._parse_key_priorities('low:-3,high:42') == {'low': 0, 'high': 9}
+
+def test_malformed_key_priorities_are_skipped():
+    assert job_priority._parse_key_priorities('batch:high,nokey,:5,key:with:colon:3') == {'key:with:colon': 3}
@@ -0,0 +1,44 @@
+import pytest
+from services import job_registry as job_registry_module
+from services.job_registry import JobRegistry
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_registry_module.time, 'time', lambda: now[0])
+    return now
+
+def test_finished_jobs_expire_after_ttl(clock):
+    registry = JobRegistry(max_jobs=0, ttl=60)
+    registry.set('done', {'state': 'completed'})
+    registry.set('running', {'state': 'running'})
+    clock[0] += 61
+    assert registry.get('done') is None
+    assert registry.get('running')['state'] == 'running'
+
+def test_update_refreshes_ttl(clock):
+    registry = JobRegistry(max_jobs=0, ttl=60)
+    registry.set('job', {'state': 'completed'})
+    clock[0] += 50
+    assert registry.update('job', stage='finished')
+    clock[0] += 50
+    assert registry.get('job') is not None
+
+def test_oldest_finished_jobs_are_dropped_beyond_max_jobs(clock):
+    registry = JobRegistry(max_jobs=2, ttl=0)
+    registry.set('active', {'state': 'queued'})
+    registry.set('old', {'state': 'completed'})
+    registry.set('new', {'state': 'failed'})
+    assert 'old' not in registry
+    assert 'new' in registry
+    assert 'active' in registry
+
+def test_active_jobs_are_never_evicted(clock):
+    registry = JobRegistry(max_jobs=1, ttl=1)
+    registry.set('a', {'state': 'queued'})
+    registry.set('b', {'state': 'running'})
+    clock[0] += 10
+    assert registry.stats() == {'queued': 1, 'running': 1}
+
+def test_update_of_unknown_job_returns_false():
+    assert not JobRegistry().update('missing', stage='encoding')
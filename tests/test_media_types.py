@@ -0,0 +1,46 @@
+import pytest
+from services.media_types import detect_container, identify
+
+@pytest.mark.parametrize('head, container', [
+    (b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00', 'mp4'),
+    (b'\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00', 'mov'),
+    (b'\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00', 'm4a'),
+    (b'\x00\x00\x00\x08wide\x00\x00\x00\x00', 'mov'),
+    (b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\x82\x84webm', 'webm'),
+    (b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\x82\x88matroska', 'mkv'),
+    (b'RIFF\x24\x00\x00\x00WAVEfmt ', 'wav'),
+    (b'RIFF\x24\x00\x00\x00AVI LIST', 'avi'),
+    (b'RIFF\x24\x00\x00\x00WEBPVP8 ', 'webp'),
+    (b'FORM\x00\x00\x00\x00AIFFCOMM', 'aiff'),
+    (b'\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR', 'png'),
+    (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'jpeg'),
+    (b'GIF89a\x01\x00\x01\x00', 'gif'),
+    (b'BM\x36\x00\x0c\x00\x00\x00\x00\x00\x36\x00\x00\x00', 'bmp'),
+    (b'OggS\x00\x02\x00\x00', 'ogg'),
+    (b'fLaC\x00\x00\x00\x22', 'flac'),
+    (b'FLV\x01\x05\x00\x00\x00\x09', 'flv'),
+    (b'\x00\x00\x01\xba\x44\x00\x04\x00', 'mpeg'),
+    (b'ID3\x04\x00\x00\x00\x00\x00\x00', 'mp3'),
+    (b'\xff\xfb\x90\x64\x00', 'mp3'),
+    (b'\xff\xf1\x50\x80\x02\x1f\xfc', 'aac'),
+])
+def test_detect_container(head, container):
+    assert detect_container(head) == container
+
+def test_detect_mpegts_from_sync_bytes():
+    packet = b'\x47' + b'\x00' * 187
+    assert detect_container(packet * 3) == 'mpegts'
+
+@pytest.mark.parametrize('head', [b'', b'<html><body>', b'RIFF\x24\x00\x00\x00XXXX', b'\x00\x00\x00\x00'])
+def test_unknown_content_is_not_detected(head):
+    assert detect_container(head) is None
+
+def test_identify_prefers_content_over_headers():
+    head = b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00'
+    assert identify(head, {'Content-Type': 'audio/mpeg'}, 'https://example.com/a.mp3') == ('.mp4', 'video/mp4', 'mp4')
+
+def test_identify_falls_back_to_content_type_then_file_name():
+    assert identify(b'', {'Content-Type': 'audio/x-wav'}) == ('.wav', 'audio/wav', None)
+    assert identify(b'', {'Content-Disposition': 'attachment; filename="clip.MKV"'},
+                    'https://example.com/download')[0] == '.mkv'
+    assert identify(b'', {}, 'https://example.com/media/track.flac?sig=1')[0] == '.flac'
@@ -0,0 +1,52 @@
+import pytest
+from services.parallel_transcription import SAMPLE_RATE, ENERGY_FRAME, find_chunk_boundaries, merge_chunk_results
+
+np = pytest.importorskip('numpy')
+
+def noise(seconds, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(seconds * SAMPLE_RATE)) * 0.3).astype(np.float32)
+
+def test_short_audio_is_one_chunk():
+    audio = noise(50)
+    assert find_chunk_boundaries(audio, chunk_seconds=100, search_seconds=10) == [0, len(audio)]
+
+def test_boundaries_fall_in_silences_near_the_target():
+    audio = noise(455)
+    silences = (95, 198, 305, 402)
+    for second in silences:
+        audio[second * SAMPLE_RATE:(second + 1) * SAMPLE_RATE] = 0
+    boundaries = find_chunk_boundaries(audio, chunk_seconds=100, search_seconds=10)
+    assert boundaries[0] == 0 and boundaries[-1] == len(audio)
+    for boundary, second in zip(boundaries[1:-1], silences):
+        assert second * SAMPLE_RATE <= boundary < (second + 1) * SAMPLE_RATE
+
+def test_boundaries_are_increasing_and_chunks_bounded():
+    audio = noise(1000, seed=1)
+    boundaries = find_chunk_boundaries(audio, chunk_seconds=100, search_seconds=10)
+    chunks = np.diff(boundaries)
+    assert (chunks > 0).all()
+    assert (chunks[:-1] <= 110 * SAMPLE_RATE + ENERGY_FRAME).all()
+    assert chunks[-1] <= 110 * SAMPLE_RATE
+
+def chunk_result(text, *spans):
+    return {'text': text, 'language': 'en',
+            'segments': [{'id': i, 'seek': 0, 'start': start, 'end': end, 'text': text,
+                          'words': [{'word': text, 'start': start, 'end': end}]}
+                         for i, (start, end) in enumerate(spans)]}
+
+def test_merge_shifts_timestamps_and_renumbers_segments():
+    boundaries = [0, 100 * SAMPLE_RATE, 150 * SAMPLE_RATE]
+    merged = merge_chunk_results([chunk_result(' a', (0, 40), (40, 99.5)), chunk_result(' b', (1, 20))],
+                                 boundaries, 'de')
+    assert merged['text'] == ' a b'
+    assert merged['language'] == 'de'
+    assert [segment['id'] for segment in merged['segments']] == [0, 1, 2]
+    assert [(segment['start'], segment['end']) for segment in merged['segments']] == [(0, 40), (40, 99.5), (101, 120)]
+    assert merged['segments'][2]['words'] == [{'word': ' b', 'start': 101, 'end': 120}]
+    assert merged['segments'][2]['seek'] == 100 * 100
+
+def test_merge_clamps_timestamps_to_their_chunk():
+    boundaries = [0, 10 * SAMPLE_RATE, 20 * SAMPLE_RATE]
+    merged = merge_chunk_results([chunk_result(' a', (5, 12)), chunk_result(' b', (0, 11))], boundaries)
+    assert [(segment['start'], segment['end']) for segment in merged['segments']] == [(5, 10), (10, 20)]
+    assert merged['language'] == 'en'
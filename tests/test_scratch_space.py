@@ -0,0 +1,40 @@
+import os
+import pytest
+from services import scratch_space
+from services.scratch_space import job_scratch, get_scratch_stats, ScratchSpaceUnavailable
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    monkeypatch.setattr(scratch_space, 'SCRATCH_ROOT', str(tmp_path))
+    monkeypatch.setattr(scratch_space, 'SCRATCH_QUOTA_BYTES', 2500)
+    monkeypatch.setattr(scratch_space, 'SCRATCH_MIN_FREE_BYTES', 0)
+    monkeypatch.setattr(scratch_space, 'SCRATCH_ADMISSION_TIMEOUT', 0)
+    monkeypatch.setattr(scratch_space, 'USAGE_SCAN_INTERVAL', 0)
+    monkeypatch.setattr(scratch_space, '_janitor_started', True)
+    return tmp_path
+
+def write(path, size):
+    with open(os.path.join(path, 'data'), 'wb') as f:
+        f.write(b'x' * size)
+
+def test_directory_is_removed_after_the_job(scratch):
+    with job_scratch('job', reserve=100) as path:
+        write(path, 10)
+    assert not os.path.exists(path)
+    assert get_scratch_stats()['reserved_bytes'] == 0
+
+def test_written_bytes_are_not_counted_as_reserved_too(scratch):
+    with job_scratch('first', reserve=1000) as path:
+        write(path, 900)
+        stats = get_scratch_stats()
+        assert stats['reserved_bytes'] == 1000 - stats['usage_bytes']
+        # 900 written + 100 still reserved + 1000 fits in 2500; counting the reservation whole would not
+        with job_scratch('second', reserve=1000):
+            pass
+
+def test_job_that_does_not_fit_is_rejected(scratch):
+    with job_scratch('first', reserve=2000):
+        with pytest.raises(ScratchSpaceUnavailable):
+            with job_scratch('second', reserve=1000):
+                pass
+    assert not os.path.exists(os.path.join(scratch, 'second'))
@@ -0,0 +1,46 @@
+import pytest
+from services.voice_activity import SAMPLE_RATE, TimeMap, detect_speech
+
+np = pytest.importorskip('numpy')
+
+# Speech from 10-20 s and 50-55 s of the original audio, joined at 10 s of the trimmed audio
+REGIONS = [(10 * SAMPLE_RATE, 20 * SAMPLE_RATE), (50 * SAMPLE_RATE, 55 * SAMPLE_RATE)]
+
+def test_to_original_maps_into_each_region():
+    time_map = TimeMap(REGIONS)
+    assert time_map.to_original(0) == 10
+    assert time_map.to_original(4.5) == 14.5
+    assert time_map.to_original(12) == 52
+
+def test_join_belongs_to_the_next_region_for_starts_and_the_previous_for_ends():
+    time_map = TimeMap(REGIONS)
+    assert time_map.to_original(10) == 50
+    assert time_map.to_original(10, is_end=True) == 20
+
+def test_to_original_clamps_past_the_end():
+    assert TimeMap(REGIONS).to_original(30, is_end=True) == 55
+
+def test_apply_rewrites_segments_and_words():
+    result = {'segments': [
+        {'start': 8, 'end': 10, 'seek': 0, 'words': [{'word': 'a', 'start': 8, 'end': 10}]},
+        {'start': 10, 'end': 13.25, 'seek': 1000, 'words': [{'word': 'b', 'start': 10.5, 'end': 13.25}]},
+    ]}
+    TimeMap(REGIONS).apply(result)
+    first, second = result['segments']
+    assert (first['start'], first['end'], first['seek']) == (18, 20, 1000)
+    assert first['words'] == [{'word': 'a', 'start': 18, 'end': 20}]
+    assert (second['start'], second['end'], second['seek']) == (50, 53.25, 5000)
+    assert second['words'] == [{'word': 'b', 'start': 50.5, 'end': 53.25}]
+
+def test_detect_speech_finds_loud_regions():
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(30 * SAMPLE_RATE) * 0.001).astype(np.float32)
+    audio[10 * SAMPLE_RATE:15 * SAMPLE_RATE] += (rng.standard_normal(5 * SAMPLE_RATE) * 0.3).astype(np.float32)
+    regions = detect_speech(audio)
+    assert len(regions) == 1
+    start, end = regions[0]
+    assert 9 * SAMPLE_RATE < start <= 10 * SAMPLE_RATE
+    assert 15 * SAMPLE_RATE <= end < 16 * SAMPLE_RATE
+
+def test_detect_speech_in_silence_finds_nothing():
+    assert detect_speech(np.zeros(10 * SAMPLE_RATE, dtype=np.float32)) == []
@@ -0,0 +1,35 @@
+import sys
+import types
+import pytest
+from services import whisper_models
+
+@pytest.fixture
+def registry(monkeypatch):
+    loaded = []
+    fake_whisper = types.SimpleNamespace(load_model=lambda size: loaded.append(size) or object())
+    monkeypatch.setitem(sys.modules, 'whisper', fake_whisper)
+    monkeypatch.setattr(whisper_models, '_models', whisper_models.OrderedDict())
+    monkeypatch.setattr(whisper_models, '_stats', {})
+    monkeypatch.setattr(whisper_models, 'WHISPER_MAX_MODELS', 1)
+    monkeypatch.setattr(whisper_models, 'WHISPER_MODEL_IDLE_TIMEOUT', 0)
+    return loaded
+
+def test_least_recently_used_model_is_evicted(registry):
+    with whisper_models.acquire_model('base'):
+        pass
+    with whisper_models.acquire_model('small'):
+        pass
+    assert list(whisper_models._models) == ['small']
+    with whisper_models.acquire_model('base'):
+        pass
+    assert registry == ['base', 'small', 'base']
+
+def test_model_in_use_is_not_evicted(registry):
+    with whisper_models.acquire_model('base') as base:
+        with whisper_models.acquire_model('small'):
+            # Over the limit while both are in use rather than dropping one mid-request
+            assert set(whisper_models._models) == {'base', 'small'}
+        assert list(whisper_models._models) == ['base']
+        assert whisper_models.get_model('base') is base
+    assert registry == ['base', 'small']
+    assert whisper_models.get_model_stats()['models']['base']['in_use'] is False
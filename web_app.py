@@ -3,6 +3,9 @@ from werkzeug.utils import secure_filename
 import os
 import uuid
 from services.v1.video.caption_video import process_captioning_v1
+from services.job_registry import JobRegistry
+from services.cloud_storage import LocalStorageProvider
+from services.local_storage import link_or_copy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,7 +15,9 @@ app.config['PROCESSED_FOLDER'] = os.path.join('static', 'processed')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
 
-JOBS = {}
+JOBS = JobRegistry(state_key='status')
+# Finished videos are hard-linked into the processed folder instead of copied
+PROCESSED_STORAGE = LocalStorageProvider(app.config['PROCESSED_FOLDER'], '/static/processed')
 
 @app.route('/')
 def index():
@@ -59,10 +64,10 @@ def upload():
 
         job_id = str(uuid.uuid4())
 
-        JOBS[job_id] = {
+        JOBS.set(job_id, {
             'status': 'processing',
             'video_path': video_path
-        }
+        })
 
         # Process in background thread
         import threading
@@ -76,15 +81,16 @@ def upload():
 
 @app.route('/status/<job_id>')
 def status(job_id):
-    if job_id not in JOBS:
+    job_data = JOBS.get(job_id)
+    if job_data is None:
         return jsonify({'error': 'Job not found'}), 404
-    return jsonify(JOBS[job_id])
+    return jsonify(job_data)
 
 @app.route('/status/<job_id>/transcript')
 def get_transcript(job_id):
-    if job_id not in JOBS:
+    job_data = JOBS.get(job_id)
+    if job_data is None:
         return jsonify({'error': 'Job not found'}), 404
-    job_data = JOBS[job_id]
     if 'transcript' not in job_data:
         return jsonify({'error': 'No transcript available'}), 404
     return job_data['transcript']
@@ -96,30 +102,29 @@ def process_video(job_id, video_path, form_data):
 
         output_type = form_data.get('output_type', 'video')
 
-        # Create working copy of the video
-        import shutil
+        # Create working copy of the video (a hard link, so the upload is not duplicated on disk)
         work_dir = os.path.join('static', 'processing')
         os.makedirs(work_dir, exist_ok=True)
         video_working_copy = os.path.join(work_dir, f"{job_id}_source.mp4")
-        shutil.copy2(video_path, video_working_copy)
+        link_or_copy(video_path, video_working_copy)
 
         if output_type in ['transcript', 'srt', 'vtt', 'ass']:
             from services.transcription import process_transcription
             file_paths = process_transcription(video_working_copy)
 
-            JOBS[job_id] = {
+            JOBS.set(job_id, {
                 'status': 'completed',
                 'transcript': file_paths['plain'],
                 'srt': file_paths['srt'],
                 'vtt': file_paths['vtt'],
                 'ass': file_paths['ass']
-            }
+            })
 
-            JOBS[job_id] = {
+            JOBS.set(job_id, {
                 'status': 'completed',
                 'transcript': f'/static/transcripted/{output_filename}',
                 'format': output_type
-            }
+            })
             return
 
         settings = {
@@ -132,7 +137,7 @@ def process_video(job_id, video_path, form_data):
             'alignment': form_data.get('alignment', 'center'),
         }
 
-        JOBS[job_id]['status'] = 'processing'
+        JOBS.update(job_id, status='processing')
 
         # Pass the local path directly
         output_path = process_captioning_v1(
@@ -146,26 +151,21 @@ def process_video(job_id, video_path, form_data):
         if isinstance(output_path, dict) and 'error' in output_path:
             raise Exception(output_path['error'])
 
-        # Get the output path and copy to static folder
-        output_filename = f"{job_id}_captioned.mp4"
-        static_output = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
-
-        # Copy the processed file to static folder
-        import shutil
-        shutil.copy2(output_path, static_output)
-
+        # Publish the processed file into the static folder
+        url = PROCESSED_STORAGE.upload_file(output_path)
+        os.remove(output_path)
 
-        JOBS[job_id] = {
+        JOBS.set(job_id, {
             'status': 'completed',
-            'url': f'/static/uploads/{output_filename}'
-        }
+            'url': url
+        })
         print(f"Job {job_id} completed. Status updated in JOBS dictionary.")
 
     except Exception as e:
-        JOBS[job_id] = {
+        JOBS.set(job_id, {
             'status': 'failed',
             'error': str(e)
-        }
+        })
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 3000))